@@ -6,12 +6,18 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime, timedelta
+import asyncio
 import logging
 
 
-from services.Twitter import Twitter
-from .utils_postwork import send_twitter_post, get_new_posts
-from .utils_translation import translate_post
+from services.ChatGPT import ChatGPT
+from services.MediaCache import media_cache
+from services.video_variants import video_probe
+from services.Twitter import AsyncTwitter, breakers
+from .utils_outbox import outbox
+from .utils_postwork import fetch_channels_posts, format_last_post_time, parse_last_post_time
+from .utils_translation import translation_stage, translation_cache
+from .utils_seen import seen_index
 from ..database import SessionLocal
 from ..utils import *
 from config import config
@@ -144,6 +150,88 @@ async def manual_update(message: types.Message, bot: Bot):
     await update_and_send_posts(bot)
     
     
+@router.message(Command("translate"))
+async def translation_mode_handler(message: types.Message):
+    """
+    Режим перевода канала: /translate <канал> <auto|always|never>
+    Без аргументов показывает текущие режимы
+    """
+    if not config.is_admin(message.from_user.id):
+        return
+
+    args = (message.text or "").split()[1:]
+    with SessionLocal() as db:
+        if not args:
+            modes = get_translation_modes(db)
+            lines = ["🌐 Режимы перевода (auto / always / never):"]
+            lines += [f"• @{channel.name}: {modes.get(channel.id, 'auto')}" for channel in get_all_channels(db)]
+            await message.answer("\n".join(lines))
+            return
+
+        if len(args) != 2 or args[1].lower() not in TRANSLATION_MODES:
+            await message.answer("❌ Формат: /translate <канал> <auto|always|never>")
+            return
+
+        channel = get_channel_by_name(db, args[0].lstrip('@'))
+        if not channel:
+            await message.answer(f"❌ Канал {args[0]} не найден")
+            return
+
+        set_translation_mode(db, channel.id, args[1].lower())
+        await message.answer(f"✅ Режим перевода @{channel.name}: {args[1].lower()}")
+
+
+async def process_channel_posts(bot: Bot, channel_id: int, new_posts: list, mode: str) -> int:
+    """
+    Проба видео, перевод и постановка в очередь новых постов одного канала
+    Работает в собственной сессии БД, чтобы каналы обрабатывались параллельно
+    :return: Число обработанных постов (0 при ошибке)
+    """
+    with SessionLocal() as db:
+        channel = db.get(models.Channel, channel_id, options=[joinedload(models.Channel.editors)])
+        if channel is None:
+            return 0
+
+        # Имя - заранее: после rollback объект канала перечитывается из БД
+        channel_name = channel.name
+        try:
+            recipients = set(editor.telegram_id for editor in channel.editors)
+            # recipients.update(config.ADMINS)
+
+            # Размер выбранных вариантов видео уточняется по HEAD (результат кэшируется по media_key)
+            new_posts = await video_probe.probe_posts(new_posts)
+
+            # Видео и GIF качаются на диск параллельно с переводом - пригодятся, если Telegram
+            # не сможет забрать файл по URL
+            media_cache.prefetch(
+                item.url for post in new_posts for item in post.media if item.type in ('video', 'animated_gif')
+            )
+
+            # Переводы идут параллельно пакетами; каждый готовый пост сразу коммитится в очередь
+            # доставки и будит воркеры, не дожидаясь перевода остальных постов канала.
+            # Не уложившиеся в дедлайн или неудачные переводы приходят с оригинальным текстом
+            async for post in translation_stage(new_posts, mode=mode):
+                outbox.enqueue(db, channel.twitter_id, post, recipients)
+                db.commit()
+                outbox.wake()
+
+            # Прогресс канала и отметки "уже видели" фиксируются после постановки всех постов;
+            # если до этого коммита дело не дойдет, повторная постановка отсечется по (post_id, chat_id)
+            last_post_time = max(post.created_at for post in new_posts)
+            if last_post_time > (parse_last_post_time(channel.last_post_time) or 0):
+                channel.last_post_time = format_last_post_time(last_post_time)
+            seen_index.mark_seen(db, channel.twitter_id, (post.id for post in new_posts))
+            db.commit()
+            return len(new_posts)
+        except Exception as e:
+            # Ошибка одного канала не должна останавливать остальные
+            db.rollback()
+            logger.exception(f"Ошибка при обработке постов для {channel_name}: {e}")
+            for ADMIN_ID in config.ADMINS:
+                await bot.send_message(ADMIN_ID, f"⚠️ Ошибка при обработке постов для {channel_name}: {e}")
+            return 0
+
+
 async def update_and_send_posts(bot: Bot):
     """Обновляет и отправляет новые посты всем подписчикам"""
 
@@ -155,67 +243,58 @@ async def update_and_send_posts(bot: Bot):
                 await bot.send_message(ADMIN_ID, "❌ В системе нет каналов для обновления")
             return
 
-        twitter_client = Twitter(config.TWITTER_API_HOST, config.TWITTER_API_KEY)
+        twitter_client = AsyncTwitter(config.TWITTER_API_HOST, config.TWITTER_API_KEYS)
+        translation_modes = get_translation_modes(db)
         rate_limit_reports = []
-        total_new_posts = 0
-
-        for channel in channels:
-            last_checked = None
-            if channel.last_post_time:
-                try:
-                    last_checked = datetime.strptime(channel.last_post_time, "%Y-%m-%d-%H-%M-%S")
-                except ValueError:
-                    last_checked = None
-
-            try:
-                result = await get_new_posts(
-                    twitter_client=twitter_client,
-                    channel_twitter_id=channel.twitter_id,
-                    last_checked_time=last_checked,
-                    bot=bot,
-                    admin_ids=config.ADMINS
-                )
-            except Exception as e:
-                for ADMIN_ID in config.ADMINS:
-                    await bot.send_message(ADMIN_ID, f"⚠️ Ошибка при получении постов для {channel.name}: {e}")
-                continue
-
-            if not result:
-                continue
-
-            new_posts, rate_limit_info = result
-            rate_limit_reports.append(rate_limit_info)
-
-            if not new_posts:
-                continue
+        # Каждый канал с новыми постами обрабатывается отдельной задачей: перевод одного канала
+        # не ждет перевода другого (общий лимит запросов к OpenAI - в translation_stage)
+        semaphore = asyncio.Semaphore(max(1, config.CHANNEL_CONCURRENCY))
+        channel_tasks = []
 
-            recipients = set(editor.telegram_id for editor in channel.editors)
-            # recipients.update(config.ADMINS)
+        async def process_channel(channel_id, new_posts, mode):
+            async with semaphore:
+                return await process_channel_posts(bot, channel_id, new_posts, mode)
 
-            for post in new_posts:
-                try:
-                    post = await translate_post(post)
-                except Exception as e:
-                    
+        try:
+            # Каналы запрашиваются параллельно, обработка идет по мере готовности
+            async for channel, result in fetch_channels_posts(
+                twitter_client=twitter_client,
+                channels=channels,
+                bot=bot,
+                admin_ids=config.ADMINS,
+                concurrency=config.FETCH_CONCURRENCY
+            ):
+                if isinstance(result, Exception):
                     for ADMIN_ID in config.ADMINS:
-                        await bot.send_message(ADMIN_ID, f"⚠️ Ошибка при переводе поста: {e}\nПост будет отправлен без перевода.")
+                        await bot.send_message(ADMIN_ID, f"⚠️ Ошибка при получении постов для {channel.name}: {result}")
+                    continue
 
-                    # Продолжим с оригинальным постом
+                if not result:
+                    continue
 
-                for recipient_id in recipients:
-                    try:
-                        await send_twitter_post(bot, recipient_id, post)
-                    except Exception as e:
-                        for ADMIN_ID in config.ADMINS:
-                            await bot.send_message(ADMIN_ID, f"⚠️ Ошибка при отправке поста {recipient_id}: {e}")
+                new_posts, rate_limit_info = result
+                rate_limit_reports.append(rate_limit_info)
 
-            last_post_time = max(post['created_at'] for post in new_posts)
-            channel.last_post_time = last_post_time
-            total_new_posts += len(new_posts)
+                if not new_posts:
+                    continue
+
+                channel_tasks.append(asyncio.create_task(
+                    process_channel(channel.id, new_posts, translation_modes.get(channel.id, 'auto'))
+                ))
+
+            total_new_posts = sum(await asyncio.gather(*channel_tasks))
+        finally:
+            # Если обновление прервано - не оставляем обработку каналов висеть в фоне
+            for task in channel_tasks:
+                task.cancel()
+
+        seen_index.prune(db)
+        translation_cache.evict(db)
+        outbox.prune(db)
 
-        db.commit()
         # logger.info(rate_limit_reports)
-        api_limit_ost = min(rate_limit_reports, key=lambda x: int(x.split('/')[0]))
+        rate_limit_reports = [r for r in rate_limit_reports if r.split('/')[0].isdigit()]
+        api_limit_ost = min(rate_limit_reports, key=lambda x: int(x.split('/')[0])) if rate_limit_reports else "нет данных"
         
         report = (
             f"📊 Обновление завершено!\n"
@@ -223,6 +302,16 @@ async def update_and_send_posts(bot: Bot):
             f"• Новых постов: {total_new_posts}\n\n"
             f"Статус API лимитов:\n" + api_limit_ost
         )
+        report += "\n\nОчередь доставки: " + outbox.report(db)
+        report += "\n\nКэш переводов: " + translation_cache.report()
+        latency_report = ChatGPT.latency.report()
+        if latency_report:
+            report += "\n\nЛатентность перевода:\n" + latency_report
+        if len(twitter_client.key_pool.keys) > 1:
+            report += "\n\nКлючи API:\n" + twitter_client.key_pool.report()
+        open_breakers = [name for name, breaker in breakers.items() if breaker.is_open]
+        if open_breakers:
+            report += "\n\n⚠️ Twitter API недоступен, запросы приостановлены: " + ", ".join(open_breakers)
         for ADMIN_ID in config.ADMINS:
             await bot.send_message(ADMIN_ID, report)
 
@@ -8,9 +8,10 @@ import re
 
 from ..database import SessionLocal
 from ..utils import *
-from services.Twitter import Twitter
+from services.Twitter import AsyncTwitter
 from config import config
 from .utils import *
+from .utils_resolve import resolve_twitter_user
 
 class EditorStates(StatesGroup):
     waiting_for_channel_name = State()
@@ -75,8 +76,8 @@ async def process_add_channel(message: types.Message, state: FSMContext):
             await message.answer("❌ Редактор не найден.")
             return
         
-        twitter_client = Twitter(config.TWITTER_API_HOST, config.TWITTER_API_KEY)
-        user_info = twitter_client.get_user_by_username(channel_name)
+        twitter_client = AsyncTwitter(config.TWITTER_API_HOST, config.TWITTER_API_KEYS)
+        user_info = await resolve_twitter_user(db, twitter_client, channel_name)
 
         if user_info['error'] == 'true':
             return await message.answer(f"❌ Ошибка: {user_info.get('data', 'Канал не найден')}")
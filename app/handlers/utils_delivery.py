@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods.base import TelegramMethod, TelegramType, Response
+
+from services.Post import Post
+from services.RateLimiter import TokenBucket
+from .utils_sendplan import build_send_plan, send_plan
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramThrottle(BaseRequestMiddleware):
+    """
+    Ограничитель исходящих запросов бота: общий лимит (~30 сообщений/сек)
+    и лимит на чат; на TelegramRetryAfter чат ставится на паузу и запрос повторяется.
+    Подключается к сессии бота, поэтому учитывает каждый вызов API, а не пост целиком.
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: float, retry_attempts: int):
+        self.global_bucket = TokenBucket(rate=global_rate, capacity=global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.retry_attempts = retry_attempts
+        self.chat_buckets: Dict[int | str, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate=self.chat_rate, capacity=self.chat_burst)
+        return bucket
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            # getUpdates, getMe и прочие запросы без чата не ограничиваем
+            return await make_request(bot, method)
+
+        # Альбом - это несколько сообщений
+        messages = len(getattr(method, 'media', None) or ()) or 1
+        bucket = self._chat_bucket(chat_id)
+        for attempt in range(self.retry_attempts + 1):
+            await bucket.acquire(min(messages, bucket.capacity))
+            await self.global_bucket.acquire(min(messages, self.global_bucket.capacity))
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.retry_attempts:
+                    raise
+                logger.warning("Telegram просит подождать %s сек (чат %s)", e.retry_after, chat_id)
+                bucket.pause(e.retry_after)
+
+
+telegram_throttle = TelegramThrottle(
+    global_rate=config.TELEGRAM_GLOBAL_RPS,
+    chat_rate=config.TELEGRAM_CHAT_RPS,
+    chat_burst=config.TELEGRAM_CHAT_BURST,
+    retry_attempts=config.TELEGRAM_RETRY_ATTEMPTS
+)
+
+
+async def deliver_post(
+        bot: Bot,
+        post: Post,
+        recipients: Iterable[int | str],
+        progress: Dict[int | str, int] | None = None,
+        on_step: Callable[[int | str, int], None] | None = None,
+        on_done: Callable[[int | str, Exception | None], None] | None = None
+) -> Dict[int | str, Exception]:
+    """
+    Отправляет пост всем получателям параллельно (темп задает TelegramThrottle)
+    План отправки строится один раз и проигрывается для каждого чата
+    :param progress: Сколько шагов плана уже отправлено по чатам; отправка продолжается
+                     с первого неотправленного шага, словарь обновляется после каждого шага
+    :param on_step: Вызывается после каждого отправленного шага: (чат, отправлено шагов)
+    :param on_done: Вызывается, как только доставка в чат закончилась: (чат, ошибка или None)
+    :return: Ошибки доставки по чатам (пустой словарь - доставлено всем)
+    """
+    plan = build_send_plan(post)
+    semaphore = asyncio.Semaphore(max(1, config.DELIVERY_CONCURRENCY))
+    recipients = list(recipients)
+    progress = progress if progress is not None else {}
+
+    def step_sent(chat_id, steps):
+        progress[chat_id] = steps
+        if on_step is not None:
+            on_step(chat_id, steps)
+
+    async def deliver(chat_id):
+        async with semaphore:
+            try:
+                await send_plan(
+                    bot, chat_id, plan,
+                    start=progress.get(chat_id, 0),
+                    on_step=lambda steps: step_sent(chat_id, steps)
+                )
+            except Exception as e:
+                if on_done is not None:
+                    on_done(chat_id, e)
+                raise
+        if on_done is not None:
+            on_done(chat_id, None)
+
+    results = await asyncio.gather(*(deliver(chat_id) for chat_id in recipients), return_exceptions=True)
+    return {
+        chat_id: result
+        for chat_id, result in zip(recipients, results)
+        if isinstance(result, Exception)
+    }
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, List
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+
+from services.LRUCache import LRUCache
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+def extract_file_id(message: Message) -> str | None:
+    """file_id медиа из отправленного сообщения (Telegram может прислать видео как анимацию или документ)"""
+    if message.photo:
+        # Последний размер - оригинал
+        return message.photo[-1].file_id
+    for attachment in (message.video, message.animation, message.document):
+        if attachment is not None:
+            return attachment.file_id
+    return None
+
+
+class FileIdCache:
+    """
+    Кэш file_id Telegram по URL медиа из Twitter.
+    Первая отправка идет по URL (Telegram скачивает файл сам), дальше - по file_id без повторной загрузки
+    """
+
+    def __init__(self, maxsize: int):
+        self.cache = LRUCache(maxsize=maxsize)
+        self._uploads: Dict[Hashable, asyncio.Lock] = {}
+
+    def source(self, url: str) -> str:
+        """Что передавать в send_*: file_id, если файл уже отправлялся, иначе URL"""
+        return self.cache.get(url, url)
+
+    def remember(self, url: str, message: Message | None) -> None:
+        file_id = extract_file_id(message) if message is not None else None
+        if file_id:
+            self.cache.set(url, file_id)
+
+    def forget(self, url: str) -> None:
+        self.cache.pop(url, None)
+
+    async def _first_upload(self, key: Hashable, ready: Callable[[], bool], send: Callable[[], Awaitable]):
+        """
+        При параллельной рассылке по URL отправляет только первый получатель,
+        остальные ждут его и идут уже по file_id
+        """
+        if ready():
+            return await send()
+        lock = self._uploads.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                return await send()
+        finally:
+            if not lock.locked() and self._uploads.get(key) is lock:
+                del self._uploads[key]
+
+    async def send(self, url: str, send: Callable[[str], Awaitable[Message]]) -> Message:
+        """
+        Отправляет медиа через send(source), подставляя file_id из кэша, и запоминает новый file_id
+        Если Telegram отверг сохраненный file_id - повторяет отправку по URL
+        """
+        return await self._first_upload(url, lambda: self.source(url) != url, lambda: self._send(url, send))
+
+    async def _send(self, url: str, send: Callable[[str], Awaitable[Message]]) -> Message:
+        source = self.source(url)
+        try:
+            message = await send(source)
+        except TelegramBadRequest:
+            if source == url:
+                raise
+            logger.warning("file_id для %s отклонен Telegram, отправляем по URL", url)
+            self.forget(url)
+            message = await send(url)
+        self.remember(url, message)
+        return message
+
+    async def send_group(self, urls: List[str], send: Callable[[List[str]], Awaitable[List[Message]]]) -> List[Message]:
+        """То же для альбома: send(sources) получает источники в порядке urls"""
+        return await self._first_upload(
+            tuple(urls),
+            lambda: all(self.source(url) != url for url in urls),
+            lambda: self._send_group(urls, send)
+        )
+
+    async def _send_group(self, urls: List[str], send: Callable[[List[str]], Awaitable[List[Message]]]) -> List[Message]:
+        sources = [self.source(url) for url in urls]
+        try:
+            messages = await send(sources)
+        except TelegramBadRequest:
+            if sources == urls:
+                raise
+            logger.warning("file_id альбома отклонен Telegram, отправляем по URL")
+            for url in urls:
+                self.forget(url)
+            messages = await send(urls)
+        for url, message in zip(urls, messages):
+            self.remember(url, message)
+        return messages
+
+
+file_id_cache = FileIdCache(config.TELEGRAM_FILE_ID_CACHE_SIZE)
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from aiogram import Bot
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from services.Post import Post
+from .utils_delivery import deliver_post
+from ..database import SessionLocal
+from .. import models
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Надежная очередь доставки в таблице outbox.
+    Сбор постов только ставит строки (пост, получатель) в очередь, доставкой занимаются воркеры.
+    Строки захватываются SELECT ... FOR UPDATE SKIP LOCKED и сразу помечаются in_progress с арендой
+    (next_attempt_at = окончание аренды), после чего транзакция закрывается - отправка идет
+    без открытой транзакции и блокировок. Пока отправка идет, аренда продлевается; строку,
+    аренда которой истекла (воркер упал), забирает другой воркер.
+    Прогресс коммитится по ходу отправки: число отправленных шагов плана - после каждого шага,
+    итог по чату - сразу, как только доставка в этот чат закончилась. Повтор продолжает
+    с первого неотправленного шага и только для незавершенных чатов.
+    Доставка - "как минимум один раз": повториться может лишь шаг, прерванный падением процесса
+    между отправкой в Telegram и коммитом прогресса.
+    """
+
+    PENDING = 'pending'
+    IN_PROGRESS = 'in_progress'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    def __init__(self, workers: int, batch_size: int, max_attempts: int, retry_base: float, poll_interval: float,
+                 lease_seconds: float):
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: List[asyncio.Task] = []
+
+    def enqueue(self, db: Session, channel_twitter_id: str, post: Post, chat_ids: Iterable) -> int:
+        """
+        Ставит пост в очередь для получателей (коммит - за вызывающим)
+        :return: Сколько строк добавлено (уже стоящие в очереди пары пропускаются)
+        """
+        chat_ids = {str(chat_id) for chat_id in chat_ids}
+        if not chat_ids:
+            return 0
+        queued = {
+            chat_id for (chat_id,) in db.query(models.OutboxMessage.chat_id).filter(
+                models.OutboxMessage.post_id == post.id,
+                models.OutboxMessage.chat_id.in_(chat_ids)
+            )
+        }
+        now = datetime.utcnow()
+        payload = post.to_json()
+        for chat_id in sorted(chat_ids - queued):
+            db.add(models.OutboxMessage(
+                channel_twitter_id=channel_twitter_id,
+                post_id=post.id,
+                chat_id=chat_id,
+                payload=payload,
+                status=self.PENDING,
+                attempts=0,
+                steps_sent=0,
+                next_attempt_at=now,
+                created_at=now
+            ))
+        return len(chat_ids - queued)
+
+    def wake(self) -> None:
+        """Будит воркеры после постановки новых строк"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _claim(self, db: Session) -> Tuple[datetime, str, Dict[int, int], Dict[int, int]] | None:
+        """
+        Захватывает готовые к отправке строки одного поста (самого раннего из свободных)
+        и коммитит аренду
+        :return: Окончание аренды, payload поста, {chat_id: id строки}, {chat_id: отправлено шагов};
+                 None - свободных строк нет
+        """
+        now = datetime.utcnow()
+        ready = (
+            # pending, у которых подошло время, и in_progress с истекшей арендой
+            models.OutboxMessage.status.in_((self.PENDING, self.IN_PROGRESS)),
+            models.OutboxMessage.next_attempt_at <= now
+        )
+        first = db.query(models.OutboxMessage).filter(*ready).order_by(
+            models.OutboxMessage.id
+        ).limit(1).with_for_update(skip_locked=True).first()
+        if first is None:
+            db.rollback()
+            return None
+        others = db.query(models.OutboxMessage).filter(
+            *ready,
+            models.OutboxMessage.post_id == first.post_id,
+            models.OutboxMessage.id != first.id
+        ).limit(self.batch_size - 1).with_for_update(skip_locked=True).all()
+
+        rows = [first] + others
+        lease_until = now + self.lease
+        claim = (
+            lease_until,
+            first.payload,
+            {int(row.chat_id): row.id for row in rows},
+            {int(row.chat_id): row.steps_sent or 0 for row in rows}
+        )
+        for row in rows:
+            row.status = self.IN_PROGRESS
+            row.next_attempt_at = lease_until
+        db.commit()
+        return claim
+
+    def _update_leased(self, row_ids: Iterable[int], lease: Dict[str, datetime],
+                       apply: Callable[[models.OutboxMessage], None]) -> int:
+        """
+        Меняет и коммитит строки, аренда которых еще наша (иначе строку уже забрал другой воркер)
+        :param lease: {'until': окончание аренды} - общее для всех обновлений одного захвата
+        :return: Сколько строк изменено
+        """
+        row_ids = list(row_ids)
+        with SessionLocal() as db:
+            rows = db.query(models.OutboxMessage).filter(
+                models.OutboxMessage.id.in_(row_ids),
+                models.OutboxMessage.status == self.IN_PROGRESS,
+                models.OutboxMessage.next_attempt_at == lease['until']
+            ).all()
+            if len(rows) < len(row_ids):
+                logger.warning("Аренда %s строк outbox потеряна", len(row_ids) - len(rows))
+            for row in rows:
+                apply(row)
+            db.commit()
+            return len(rows)
+
+    def _apply_result(self, row: models.OutboxMessage, error: Exception | None, now: datetime) -> None:
+        """Итог доставки в чат: отправлено, повтор позже или окончательная ошибка"""
+        if error is None:
+            row.status = self.SENT
+            row.sent_at = now
+            return
+        row.attempts += 1
+        row.last_error = str(error)
+        if row.attempts >= self.max_attempts:
+            row.status = self.FAILED
+        else:
+            row.status = self.PENDING
+            row.next_attempt_at = now + timedelta(seconds=self.retry_base * 2 ** (row.attempts - 1))
+
+    async def _renew_lease(self, row_ids: Dict[int, int], done: set, lease: Dict[str, datetime]) -> None:
+        """Продлевает аренду незавершенных строк, пока идет отправка (долгие паузы Telegram)"""
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            renewed = datetime.utcnow() + self.lease
+
+            def extend(row: models.OutboxMessage) -> None:
+                row.next_attempt_at = renewed
+
+            self._update_leased((row_ids[chat_id] for chat_id in row_ids if chat_id not in done), lease, extend)
+            lease['until'] = renewed
+
+    async def process_batch(self, bot: Bot) -> int:
+        """
+        Захватывает строки очередного поста и рассылает его получателям параллельно
+        Транзакция на время отправки не держится; прогресс и итог по каждому чату
+        коммитятся по ходу отправки
+        :return: Сколько строк обработано (0 - очередь пуста)
+        """
+        with SessionLocal() as db:
+            claim = self._claim(db)
+        if claim is None:
+            return 0
+
+        lease_until, payload, row_ids, progress = claim
+        lease = {'until': lease_until}
+        done = set()
+        failed = []
+        post = Post.from_json(payload)
+
+        def on_step(chat_id: int, steps: int) -> None:
+            def record(row: models.OutboxMessage) -> None:
+                row.steps_sent = steps
+            self._update_leased([row_ids[chat_id]], lease, record)
+
+        def on_done(chat_id: int, error: Exception | None) -> None:
+            done.add(chat_id)
+            now = datetime.utcnow()
+
+            def record(row: models.OutboxMessage) -> None:
+                self._apply_result(row, error, now)
+                if row.status == self.FAILED:
+                    failed.append((row.post_id, row.chat_id, row.attempts, row.last_error))
+            self._update_leased([row_ids[chat_id]], lease, record)
+
+        renewal = asyncio.create_task(self._renew_lease(row_ids, done, lease))
+        try:
+            await deliver_post(bot, post, list(row_ids), progress, on_step=on_step, on_done=on_done)
+        except asyncio.CancelledError:
+            # Остановка бота - незавершенные чаты возвращаем в очередь (отправленные шаги уже записаны)
+            def release(row: models.OutboxMessage) -> None:
+                row.status = self.PENDING
+                row.next_attempt_at = datetime.utcnow()
+            self._update_leased((row_ids[chat_id] for chat_id in row_ids if chat_id not in done), lease, release)
+            raise
+        finally:
+            renewal.cancel()
+
+        for post_id, chat_id, attempts, last_error in failed:
+            logger.error("Пост %s не доставлен в чат %s: %s", post_id, chat_id, last_error)
+            for ADMIN_ID in config.ADMINS:
+                await bot.send_message(
+                    ADMIN_ID,
+                    f"⚠️ Ошибка при отправке поста {post_id} получателю {chat_id} "
+                    f"после {attempts} попыток: {last_error}"
+                )
+        return len(row_ids)
+
+    async def _worker(self, bot: Bot, number: int) -> None:
+        while True:
+            try:
+                if await self.process_batch(bot):
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Ошибка воркера доставки #{number}: {e}")
+
+            # Очередь пуста - ждем новых строк (или наступления времени повторов)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self, bot: Bot) -> None:
+        """Запускает воркеры (при старте бота); строки, оставшиеся с прошлого запуска, будут доставлены"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(bot, number)) for number in range(self.workers)]
+        logger.info("Запущено воркеров доставки: %s", self.workers)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def prune(self, db: Session) -> int:
+        """Удаляет отправленные и окончательно неудачные строки старше OUTBOX_RETENTION_DAYS"""
+        deleted = db.query(models.OutboxMessage).filter(
+            models.OutboxMessage.status.in_((self.SENT, self.FAILED)),
+            models.OutboxMessage.created_at < datetime.utcnow() - timedelta(days=config.OUTBOX_RETENTION_DAYS)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+    def report(self, db: Session) -> str:
+        counts = dict(
+            db.query(models.OutboxMessage.status, func.count()).group_by(models.OutboxMessage.status).all()
+        )
+        return (
+            f"в очереди {counts.get(self.PENDING, 0) + counts.get(self.IN_PROGRESS, 0)}, "
+            f"отправлено {counts.get(self.SENT, 0)}, "
+            f"ошибок {counts.get(self.FAILED, 0)}"
+        )
+
+
+outbox = Outbox(
+    workers=config.OUTBOX_WORKERS,
+    batch_size=config.OUTBOX_BATCH_SIZE,
+    max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+    retry_base=config.OUTBOX_RETRY_BASE,
+    poll_interval=config.OUTBOX_POLL_INTERVAL,
+    lease_seconds=config.OUTBOX_LEASE_SECONDS
+)
@@ -1,121 +1,98 @@
-from aiogram.types import InputMediaPhoto, InputMediaVideo, Message
-from aiogram.utils.markdown import hlink
 from aiogram import Bot
+import asyncio
+import logging
+import math
 import re
+import time
 
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Iterable, Tuple
 
-from services.Twitter import Twitter
+from services.Twitter import AsyncTwitter
+from services.Post import Post
+from services.twitter_time import parse_post_time, format_post_time
+from .utils_seen import seen_index
+from .utils_sendplan import build_send_plan, send_plan
+from config import config
 
+logger = logging.getLogger(__name__)
 
-async def send_twitter_post(bot: Bot, chat_id: int, post: dict):
+# Оценка частоты постинга по каналам (постов в час, скользящее среднее)
+_posting_rates: Dict[str, float] = {}
+_RATE_SMOOTHING = 0.3
+
+
+async def send_twitter_post(bot: Bot, chat_id: int, post: Post):
     """
     Отправляет пост из Twitter в Telegram с сохранением медиа-вложений
+    Для рассылки многим получателям лучше один раз построить план (build_send_plan)
+    и проигрывать его для каждого чата
     :param bot: Экземпляр бота aiogram
     :param chat_id: ID чата для отправки
-    :param post: Словарь с данными поста из Twitter API
+    :param post: Пост из Twitter API
     """
-    # Обработка текста поста
-    text = post.get('text', '')
-    
-    # Выделяем ссылки из текста
-    links = re.findall(r'https?://\S+', text)
-    clean_text = re.sub(r'https?://\S+', '', text).strip()
-    
-    # Форматируем ссылки как кликабельные
-    formatted_links = "\n\n🔗 " + "\n🔗 ".join(links) if links else ""
-    
-    # Формируем итоговый текст
-    formatted_text = f"{clean_text}{formatted_links}" if clean_text or links else ""
+    await send_plan(bot, chat_id, build_send_plan(post))
 
-    # Обработка медиа-вложений
-    media = post.get('media', [])
-    
-    # Если нет медиа - просто отправляем текст
-    if not media:
-        if formatted_text:
-            await bot.send_message(chat_id, formatted_text)
-        return
-    
-    # Разделяем фото и видео
-    photos = [m for m in media if m['type'] == 'photo']
-    videos = [m for m in media if m['type'] == 'video']
-    
-    # Если есть хотя бы одно видео - отправляем первое видео с текстом
-    if videos:
-            try:
-                video_url = videos[0]['url']
-                await bot.send_video(
-                    chat_id=chat_id,
-                    video=video_url,
-                    caption=formatted_text[:1024] if formatted_text else None
-                )
-            except Exception as e:
-                # Fallback: отправляем как ссылку
-                await bot.send_message(
-                    chat_id,
-                    f"🎥 Видео: {video_url}\n\n{formatted_text}" if formatted_text else f"🎥 Видео: {video_url}"
-                )
-    
-    # Отправляем фото (если есть)
-    if photos:
-        # Если фото больше 1 - отправляем как альбом
-        if len(photos) > 1:
-            media_group = []
-            for i, photo in enumerate(photos):
-                # Для первого фото добавляем текст
-                if i == 0 and formatted_text:
-                    media_group.append(
-                        InputMediaPhoto(
-                            media=photo['url'],
-                            caption=formatted_text[:1024]
-                        )
-                    )
-                else:
-                    media_group.append(
-                        InputMediaPhoto(media=photo['url'])
-                    )
-            await bot.send_media_group(chat_id, media_group)
-        
-        # Если только одно фото
-        else:
-            await bot.send_photo(
-                chat_id=chat_id,
-                photo=photos[0]['url'],
-                caption=formatted_text[:1024] if formatted_text else None
-            )
-            
+
+def choose_page_size(channel_twitter_id: str, min_time: int) -> int:
+    """
+    Подбирает размер страницы под частоту постинга канала:
+    сколько постов ожидаем с min_time плюс небольшой запас
+    """
+    rate = _posting_rates.get(channel_twitter_id)
+    if rate is None:
+        return config.TWITTER_PAGE_SIZE_DEFAULT
+
+    hours = max((time.time() - min_time) / 3600, 0)
+    expected = math.ceil(rate * hours * 1.2) + 2
+    return max(config.TWITTER_PAGE_SIZE_MIN, min(config.TWITTER_PAGE_SIZE_MAX, expected))
+
+
+def record_posting_rate(channel_twitter_id: str, new_posts_count: int, min_time: int) -> None:
+    """Обновляет оценку частоты постинга канала по результатам очередной загрузки"""
+    hours = max((time.time() - min_time) / 3600, 1 / 60)
+    observed = new_posts_count / hours
+    previous = _posting_rates.get(channel_twitter_id)
+    _posting_rates[channel_twitter_id] = (
+        observed if previous is None
+        else previous + _RATE_SMOOTHING * (observed - previous)
+    )
 
 
 async def get_new_posts(
-    twitter_client: Twitter,
+    twitter_client: AsyncTwitter,
     channel_twitter_id: str,
-    last_checked_time: datetime,
+    last_checked_time: int | None,
     bot: Bot,
     admin_ids: List[int]
-) -> List[Dict[str, Any]]:
+) -> List[Post]:
     """
     Получает новые посты для канала начиная с последнего времени проверки
     :param twitter_client: Экземпляр клиента Twitter
     :param channel_twitter_id: Twitter ID канала
-    :param last_checked_time: Время последней проверки
+    :param last_checked_time: Время последнего поста (unix-время)
     :param bot: Экземпляр бота для отправки уведомлений
     :param admin_ids: Список ID администраторов
     :return: Список новых постов
     """
     try:
-        # Вычисляем время для фильтрации (последняя проверка или 24 часа назад)
-        min_time = last_checked_time if last_checked_time else datetime.today() - timedelta(hours=72)
+        # Вычисляем время для фильтрации (последняя проверка или 72 часа назад)
+        min_time = last_checked_time if last_checked_time else int(time.time()) - 72 * 3600
         
-        # Получаем посты через API
-        response = twitter_client.get_user_tweets(
+        # Получаем посты через API, следуя по курсору до min_time
+        response = await twitter_client.get_user_tweets(
             user=channel_twitter_id,
-            count="20",  # Получаем последние 20 постов
+            count=str(choose_page_size(channel_twitter_id, min_time)),
             min_created_at_datetime=min_time,
-            exclude_retweets=True
+            exclude_retweets=True,
+            max_pages=config.TWITTER_MAX_PAGES
         )
         
+        # Предохранитель открыт - API лежит, админов уведомляем один раз в отчете
+        if response.get('circuit_open'):
+            logger.warning("Канал %s пропущен: %s", channel_twitter_id, response['data'])
+            return []
+
         # Обрабатываем ошибки API
         if response['error'] == 'true':
             error_msg = response.get('data', 'Unknown error')
@@ -125,12 +102,76 @@ async def get_new_posts(
                     f"❌ Ошибка при получении постов для канала {channel_twitter_id}:\n{error_msg}"
                 )
             return []
+
+        # Отбрасываем уже доставленные твиты (в т.ч. закрепленный и с тем же временем)
+        new_posts = seen_index.filter_unseen(channel_twitter_id, response['data'])
+
+        if response.get('truncated'):
+            logger.warning(
+                "Канал %s: достигнут лимит страниц (%s), часть постов могла быть пропущена",
+                channel_twitter_id, response['pages']
+            )
+        record_posting_rate(channel_twitter_id, len(new_posts), min_time)
         
-        return response['data'], f"{response['rate_limit_remaining']}/{response['rate_limit_limit']}"
+        return new_posts, f"{response['rate_limit_remaining']}/{response['rate_limit_limit']}"
     
     except Exception as e:
         # Обрабатываем исключения при работе с API
         error_msg = f"Critical error for channel {channel_twitter_id}: {str(e)}"
         for admin_id in admin_ids:
             await bot.send_message(admin_id, error_msg)
-        return []
\ No newline at end of file
+        return []
+
+
+def parse_last_post_time(last_post_time: str | None) -> int | None:
+    """Преобразует Channel.last_post_time (ГГГГ-ММ-ДД-ЧЧ-ММ-СС, UTC) в unix-время"""
+    return parse_post_time(last_post_time)
+
+
+def format_last_post_time(created_at: int) -> str:
+    """Преобразует unix-время поста в формат Channel.last_post_time"""
+    return format_post_time(created_at)
+
+
+async def fetch_channels_posts(
+    twitter_client: AsyncTwitter,
+    channels: Iterable[Any],
+    bot: Bot,
+    admin_ids: List[int],
+    concurrency: int
+) -> AsyncIterator[Tuple[Any, Any]]:
+    """
+    Параллельно получает новые посты для набора каналов и отдает результаты
+    по мере готовности каждого канала (а не в исходном порядке)
+    :param twitter_client: Экземпляр асинхронного клиента Twitter
+    :param channels: Каналы (объекты models.Channel)
+    :param bot: Экземпляр бота для отправки уведомлений
+    :param admin_ids: Список ID администраторов
+    :param concurrency: Максимальное число одновременных запросов
+    :return: Пары (канал, результат get_new_posts или исключение)
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(channel):
+        async with semaphore:
+            try:
+                result = await get_new_posts(
+                    twitter_client=twitter_client,
+                    channel_twitter_id=channel.twitter_id,
+                    last_checked_time=parse_last_post_time(channel.last_post_time),
+                    bot=bot,
+                    admin_ids=admin_ids
+                )
+            except Exception as e:
+                # Ошибка одного канала не должна прерывать остальные
+                return channel, e
+            return channel, result
+
+    tasks = [asyncio.create_task(fetch(channel)) for channel in channels]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Если потребитель прервал итерацию - отменяем оставшиеся запросы
+        for task in tasks:
+            task.cancel()
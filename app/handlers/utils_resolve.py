@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from typing import Dict, Any
+
+from sqlalchemy.orm import Session
+
+from services.Twitter import AsyncTwitter
+from services.LRUCache import LRUCache
+from ..utils import get_channel_by_name, get_cached_twitter_user, save_cached_twitter_user
+from config import config
+
+# Быстрый слой в памяти процесса: username (нижний регистр) -> rest_id или None
+_user_cache = LRUCache(maxsize=config.USER_CACHE_SIZE)
+
+_POSITIVE_TTL = timedelta(hours=config.USER_CACHE_TTL_HOURS)
+_NEGATIVE_TTL = timedelta(hours=config.USER_CACHE_NEGATIVE_TTL_HOURS)
+
+
+def _found(rest_id: str) -> Dict[str, Any]:
+    return {"error": 'false', "data": rest_id}
+
+
+def _not_found() -> Dict[str, Any]:
+    return {"error": 'true', "data": 'Канал не найден', "not_found": True}
+
+
+def _remember(username: str, rest_id: str | None) -> None:
+    ttl = _POSITIVE_TTL if rest_id else _NEGATIVE_TTL
+    _user_cache.set(username, rest_id, ttl=ttl.total_seconds())
+
+
+async def resolve_twitter_user(db: Session, twitter_client: AsyncTwitter, username: str) -> Dict[str, Any]:
+    """
+    Определяет rest_id аккаунта по username, обращаясь к API только при промахе кэша
+    :param db: Сессия базы данных
+    :param twitter_client: Экземпляр асинхронного клиента Twitter
+    :param username: Имя аккаунта (без @)
+    :return: Словарь в формате Twitter.get_user_by_username
+    """
+    username = username.lstrip('@').lower()
+
+    # 1. Кэш в памяти
+    cached = _user_cache.get(username, default=...)
+    if cached is not ...:
+        return _found(cached) if cached else _not_found()
+
+    # 2. Канал уже добавлен другим редактором
+    channel = get_channel_by_name(db, username)
+    if channel:
+        _remember(username, channel.twitter_id)
+        return _found(channel.twitter_id)
+
+    # 3. Таблица кэша с TTL (включая отрицательные результаты)
+    entry = get_cached_twitter_user(db, username)
+    if entry:
+        ttl = _POSITIVE_TTL if entry.rest_id else _NEGATIVE_TTL
+        if entry.resolved_at + ttl > datetime.utcnow():
+            _remember(username, entry.rest_id)
+            return _found(entry.rest_id) if entry.rest_id else _not_found()
+
+    # 4. Запрос к API
+    user_info = await twitter_client.get_user_by_username(username)
+
+    if user_info['error'] == 'false':
+        save_cached_twitter_user(db, username, user_info['data'])
+        _remember(username, user_info['data'])
+    elif user_info.get('not_found'):
+        # Кэшируем несуществующий аккаунт, временные ошибки API не кэшируем
+        save_cached_twitter_user(db, username, None)
+        _remember(username, None)
+
+    return user_info
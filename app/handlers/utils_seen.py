@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+from sqlalchemy.orm import Session
+
+from services.BloomFilter import BloomFilter
+from services.Post import Post
+from ..database import SessionLocal
+from .. import models
+from config import config
+
+
+class SeenTweetIndex:
+    """
+    Индекс уже доставленных твитов по каналам: Bloom-фильтр в памяти перед таблицей seen_tweets.
+    Фильтр отсекает заведомо новые твиты без запроса к БД, БД подтверждает возможные повторы.
+    Твит, который снова пришел в ленте (на границе last_post_time или закрепленный), продлевает
+    свою запись - иначе prune удалил бы ее, и твит ушел бы повторно.
+    """
+
+    # Не чаще раза в сутки обновляем seen_at у повторно встреченного твита
+    TOUCH_INTERVAL = timedelta(days=1)
+
+    def __init__(self, capacity: int, retention_days: int):
+        self.capacity = capacity
+        self.retention = timedelta(days=retention_days)
+        self._filters: Dict[str, BloomFilter] = {}
+
+    def _load_filter(self, db: Session, channel_twitter_id: str) -> BloomFilter:
+        bloom = self._filters.get(channel_twitter_id)
+        if bloom is not None and not bloom.saturated:
+            return bloom
+
+        rows = db.query(models.SeenTweet.tweet_id).filter(
+            models.SeenTweet.channel_twitter_id == channel_twitter_id
+        ).all()
+        bloom = BloomFilter(max(self.capacity, len(rows) * 2))
+        for (tweet_id,) in rows:
+            bloom.add(tweet_id)
+        self._filters[channel_twitter_id] = bloom
+        return bloom
+
+    def filter_unseen(self, channel_twitter_id: str, posts: List[Post]) -> List[Post]:
+        """
+        Оставляет только посты, которые еще не доставлялись по каналу
+        :param channel_twitter_id: Twitter ID канала
+        :param posts: Посты после фильтра по времени
+        :return: Новые посты в исходном порядке
+        """
+        if not posts:
+            return posts
+
+        with SessionLocal() as db:
+            bloom = self._load_filter(db, channel_twitter_id)
+            maybe_seen = [post.id for post in posts if post.id in bloom]
+            seen = set()
+            if maybe_seen:
+                rows = db.query(models.SeenTweet).filter(
+                    models.SeenTweet.channel_twitter_id == channel_twitter_id,
+                    models.SeenTweet.tweet_id.in_(maybe_seen)
+                ).all()
+                seen = {row.tweet_id for row in rows}
+
+                # Твит все еще в ленте - продлеваем запись, чтобы prune ее не удалил
+                now = datetime.utcnow()
+                stale = [row for row in rows if now - row.seen_at > self.TOUCH_INTERVAL]
+                for row in stale:
+                    row.seen_at = now
+                if stale:
+                    db.commit()
+
+        return [post for post in posts if post.id not in seen]
+
+    def mark_seen(self, db: Session, channel_twitter_id: str, tweet_ids: Iterable[str]) -> None:
+        """
+        Отмечает твиты как доставленные. Коммит - на стороне вызывающего,
+        вместе с Channel.last_post_time
+        """
+        now = datetime.utcnow()
+        bloom = self._load_filter(db, channel_twitter_id)
+        for tweet_id in set(tweet_ids):
+            db.merge(models.SeenTweet(channel_twitter_id=channel_twitter_id, tweet_id=tweet_id, seen_at=now))
+            bloom.add(tweet_id)
+
+    def prune(self, db: Session) -> int:
+        """Удаляет записи старше срока хранения и сбрасывает фильтры (перестроятся при следующем обращении)"""
+        deleted = db.query(models.SeenTweet).filter(
+            models.SeenTweet.seen_at < datetime.utcnow() - self.retention
+        ).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            self._filters.clear()
+        return deleted
+
+
+seen_index = SeenTweetIndex(
+    capacity=config.SEEN_BLOOM_CAPACITY,
+    retention_days=config.SEEN_TWEETS_RETENTION_DAYS
+)
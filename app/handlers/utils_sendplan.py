@@ -0,0 +1,191 @@
+import logging
+import re
+from dataclasses import dataclass, replace
+from typing import Callable, List, Tuple
+
+from aiogram import Bot
+from aiogram.types import FSInputFile, InputMediaPhoto, InputMediaVideo
+
+from services.MediaCache import media_cache
+from services.Post import Media, Post
+from .utils_media import file_id_cache
+
+# Лимиты Telegram: подпись к медиа и текст сообщения
+CAPTION_LIMIT = 1024
+MESSAGE_LIMIT = 4096
+# Максимум элементов в альбоме
+ALBUM_LIMIT = 10
+
+logger = logging.getLogger(__name__)
+
+_LINK_RE = re.compile(r'https?://\S+')
+
+
+@dataclass(frozen=True, slots=True)
+class SendStep:
+    """Один вызов Telegram API из плана отправки"""
+    kind: str  # 'text' | 'photo' | 'video' | 'animation' | 'album'
+    text: str | None = None  # Текст сообщения или подпись к медиа
+    media: Tuple[Media, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class SendPlan:
+    """
+    Готовый план отправки поста: текст, разбивка по лимитам и порядок вызовов
+    Строится один раз на пост и проигрывается для каждого получателя
+    """
+    steps: Tuple[SendStep, ...]
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Делит текст на части не длиннее limit, по возможности по переносам строк и пробелам"""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit)
+        if cut <= 0:
+            cut = text.rfind(' ', 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+def format_post_text(text: str) -> str:
+    """Текст поста со ссылками, вынесенными в конец"""
+    # Выделяем ссылки из текста
+    links = _LINK_RE.findall(text)
+    clean_text = _LINK_RE.sub('', text).strip()
+
+    # Форматируем ссылки как кликабельные
+    formatted_links = "\n\n🔗 " + "\n🔗 ".join(links) if links else ""
+
+    # Формируем итоговый текст
+    return f"{clean_text}{formatted_links}" if clean_text or links else ""
+
+
+def compose_media_steps(media: Tuple[Media, ...], caption: str | None) -> List[SendStep]:
+    """
+    Раскладывает медиа поста на минимум вызовов:
+    фото и видео - альбомами до 10 элементов (одиночный элемент - отдельным вызовом),
+    GIF (animated_gif) в альбом не входят и отправляются через send_animation.
+    Подпись достается только первому вызову.
+    """
+    groupable = [m for m in media if m.type in ('photo', 'video')]
+    animations = [m for m in media if m.type == 'animated_gif']
+
+    steps = []
+    for start in range(0, len(groupable), ALBUM_LIMIT):
+        chunk = tuple(groupable[start:start + ALBUM_LIMIT])
+        if len(chunk) == 1:
+            steps.append(SendStep(chunk[0].type, media=chunk))
+        else:
+            steps.append(SendStep('album', media=chunk))
+    steps += [SendStep('animation', media=(m,)) for m in animations]
+
+    if steps and caption:
+        steps[0] = replace(steps[0], text=caption)
+    return steps
+
+
+def build_send_plan(post: Post) -> SendPlan:
+    """
+    Строит план отправки поста
+    Текст длиннее подписи (1024) идет отдельными сообщениями после медиа
+    """
+    formatted_text = format_post_text(post.text or "")
+    text_steps = [SendStep('text', text=chunk) for chunk in split_text(formatted_text)]
+
+    caption = None
+    if len(formatted_text) <= CAPTION_LIMIT:
+        caption = formatted_text or None
+
+    media_steps = compose_media_steps(post.media, caption)
+    # Если нет медиа - просто отправляем текст; короткий текст уже стал подписью
+    if media_steps and caption:
+        text_steps = []
+
+    return SendPlan(tuple(media_steps + text_steps))
+
+
+def _input_media(item: Media, source: str, caption: str | None):
+    if item.type == 'video':
+        return InputMediaVideo(media=source, caption=caption)
+    return InputMediaPhoto(media=source, caption=caption)
+
+
+def _fallback_text(item: Media, caption: str | None) -> str:
+    """Текст вместо медиа, которое Telegram не смог отправить"""
+    label = "🎥 Видео" if item.type in ('video', 'animated_gif') else "🖼 Фото"
+    text = f"{label}: {item.url}\n\n{caption}" if caption else f"{label}: {item.url}"
+    return text[:MESSAGE_LIMIT]
+
+
+# Тип медиа -> метод бота и имя аргумента с файлом
+_SINGLE_METHODS = {
+    'photo': ('send_photo', 'photo'),
+    'video': ('send_video', 'video'),
+    'animated_gif': ('send_animation', 'animation'),
+}
+
+
+async def _send_single(bot: Bot, chat_id: int, item: Media, caption: str | None) -> None:
+    """Одно медиа отдельным вызовом: по URL / file_id, затем загрузкой с диска, в крайнем случае - ссылкой"""
+    method_name, field = _SINGLE_METHODS[item.type]
+    method = getattr(bot, method_name)
+    try:
+        # Повторные отправки того же файла идут по file_id, без скачивания Telegram-ом
+        await file_id_cache.send(item.url, lambda source: method(chat_id=chat_id, caption=caption, **{field: source}))
+        return
+    except Exception as e:
+        logger.warning("Не удалось отправить %s в чат %s по URL: %s", item.url, chat_id, e)
+
+    # Telegram не смог забрать файл сам - загружаем его с диска (обычно уже скачан заранее)
+    path = await media_cache.fetch(item.url)
+    if path is not None:
+        try:
+            message = await method(chat_id=chat_id, caption=caption, **{field: FSInputFile(path)})
+            file_id_cache.remember(item.url, message)
+            return
+        except Exception as e:
+            logger.warning("Не удалось загрузить %s в чат %s: %s", item.url, chat_id, e)
+
+    # Fallback: отправляем как ссылку
+    await bot.send_message(chat_id, _fallback_text(item, caption))
+
+
+async def send_plan(bot: Bot, chat_id: int, plan: SendPlan, start: int = 0,
+                    on_step: Callable[[int], None] | None = None) -> None:
+    """
+    Проигрывает план отправки для одного чата
+    :param start: С какого шага начинать (предыдущие уже отправлены)
+    :param on_step: Вызывается после каждого отправленного шага с числом отправленных шагов
+    """
+    for index, step in enumerate(plan.steps[start:], start):
+        if step.kind == 'text':
+            await bot.send_message(chat_id, step.text)
+
+        elif step.kind == 'album':
+            try:
+                await file_id_cache.send_group(
+                    [item.url for item in step.media],
+                    lambda sources: bot.send_media_group(chat_id, [
+                        # Подпись - у первого элемента альбома
+                        _input_media(item, source, step.text if i == 0 else None)
+                        for i, (item, source) in enumerate(zip(step.media, sources))
+                    ])
+                )
+            except Exception as e:
+                # Альбом целиком не ушел (обычно из-за одного видео) - отправляем элементы по одному
+                logger.warning("Альбом не отправлен в чат %s (%s), отправляем по одному", chat_id, e)
+                for i, item in enumerate(step.media):
+                    await _send_single(bot, chat_id, item, step.text if i == 0 else None)
+
+        else:
+            await _send_single(bot, chat_id, step.media[0], step.text)
+
+        if on_step is not None:
+            on_step(index + 1)
@@ -1,20 +1,233 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
 from services.ChatGPT import ChatGPT
-from typing import Dict, Any
+from services.LanguageDetect import needs_translation
+from services.LRUCache import LRUCache
+from services.Post import Post
+from ..database import SessionLocal
+from .. import models
+from config import config
+
+logger = logging.getLogger(__name__)
 
 chatgpt = ChatGPT()
 
-async def translate_post(post: Dict[str, Any], prompt_path: str = "prompts/translation_prompt.txt") -> Dict[str, Any]:
+
+class TranslationCache:
+    """
+    Двухуровневый кэш переводов: LRU в памяти процесса и таблица translation_cache в Postgres.
+    Ключ зависит от текста, промпта и модели - смена промпта или модели дает новые переводы.
+    """
+
+    # Не чаще раза в сутки обновляем last_used_at у записи в БД
+    TOUCH_INTERVAL = timedelta(days=1)
+
+    def __init__(self, size: int, ttl_days: int, max_rows: int):
+        self.memory = LRUCache(maxsize=size)
+        self.ttl = timedelta(days=ttl_days)
+        self.max_rows = max_rows
+        self.stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0}
+
+    def get(self, key: str) -> str | None:
+        translation = self.memory.get(key)
+        if translation is not None:
+            self.stats['memory_hits'] += 1
+            return translation
+
+        with SessionLocal() as db:
+            entry = db.query(models.TranslationCache).filter(models.TranslationCache.key == key).first()
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            now = datetime.utcnow()
+            if now - entry.last_used_at > self.TOUCH_INTERVAL:
+                entry.last_used_at = now
+                db.commit()
+            translation = entry.translation
+
+        self.stats['db_hits'] += 1
+        self.memory.set(key, translation)
+        return translation
+
+    def set(self, key: str, translation: str) -> None:
+        self.memory.set(key, translation)
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            db.merge(models.TranslationCache(key=key, translation=translation, created_at=now, last_used_at=now))
+            db.commit()
+
+    def evict(self, db: Session) -> int:
+        """Удаляет устаревшие записи и самые давно использованные сверх max_rows"""
+        deleted = db.query(models.TranslationCache).filter(
+            models.TranslationCache.last_used_at < datetime.utcnow() - self.ttl
+        ).delete(synchronize_session=False)
+
+        excess = db.query(models.TranslationCache).count() - self.max_rows
+        if excess > 0:
+            oldest = db.query(models.TranslationCache.key).order_by(
+                models.TranslationCache.last_used_at
+            ).limit(excess).subquery()
+            deleted += db.query(models.TranslationCache).filter(
+                models.TranslationCache.key.in_(oldest.select())
+            ).delete(synchronize_session=False)
+
+        db.commit()
+        return deleted
+
+    def report(self) -> str:
+        hits = self.stats['memory_hits'] + self.stats['db_hits']
+        total = hits + self.stats['misses']
+        rate = f"{hits / total:.0%}" if total else "—"
+        return (
+            f"попаданий {hits} (память {self.stats['memory_hits']}, БД {self.stats['db_hits']}), "
+            f"промахов {self.stats['misses']}, hit rate {rate}"
+        )
+
+
+def should_translate(post: Post, mode: str = 'auto') -> bool:
+    """
+    Нужно ли переводить пост (без обращения к сети)
+    :param mode: Режим канала: auto - по локальному определению языка, always - всегда, never - никогда
+    """
+    if mode == 'never' or not post.text:
+        return False
+    if mode == 'always':
+        return True
+    return needs_translation(post.text, config.TRANSLATION_TARGET_LANG, config.TRANSLATION_SKIP_THRESHOLD)
+
+
+translation_cache = TranslationCache(
+    size=config.TRANSLATION_CACHE_SIZE,
+    ttl_days=config.TRANSLATION_CACHE_TTL_DAYS,
+    max_rows=config.TRANSLATION_CACHE_MAX_ROWS
+)
+
+
+async def translate_post(post: Post, prompt_path: str = "prompts/translation_prompt.txt", mode: str = 'auto') -> Post:
     """
     Переводит текст поста и сохраняет оригинальный текст
-    :param post: Словарь с данными поста
+    :param post: Пост
     :param prompt_path: Путь к файлу с промптом
-    :return: Модифицированный пост с переводом
-    """
-    # Сохраняем оригинальный текст
-    post['original_text'] = post.get('text', '')
-    
-    # Переводим только если есть текст
-    if post['original_text']:
-        post['text'] = await chatgpt.generate_translation(post['original_text'], prompt_path)
-    
-    return post
\ No newline at end of file
+    :param mode: Режим перевода канала (auto / always / never)
+    :return: Копия поста с переводом (исходный пост не меняется)
+    """
+    # Уже на целевом языке, только ссылки/эмодзи или перевод отключен - сеть не трогаем
+    if not should_translate(post, mode):
+        return post
+
+    key = chatgpt.translation_key(post.text, prompt_path)
+    translation = translation_cache.get(key)
+    if translation is None:
+        translation = await chatgpt.request_translation(post.text, prompt_path)
+        if translation is None:
+            # Перевод не удался - не кэшируем, отправляем оригинал
+            return post
+        translation_cache.set(key, translation)
+
+    return post.with_translation(translation)
+
+
+_translation_semaphore: asyncio.Semaphore | None = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Общий на процесс лимит одновременных запросов перевода"""
+    global _translation_semaphore
+    if _translation_semaphore is None:
+        _translation_semaphore = asyncio.Semaphore(max(1, config.TRANSLATION_CONCURRENCY))
+    return _translation_semaphore
+
+
+async def _translate_batch(batch: Dict[str, Post], keys: Dict[str, str], prompt_path: str, timeout: float) -> List[Post]:
+    """
+    Переводит пакет постов; дедлайн timeout - на каждый запрос к OpenAI, а не на пакет целиком,
+    поэтому уже полученные переводы кэшируются, даже если другой запрос не уложился
+    Ожидание семафора в дедлайн не входит - он ограничивает только сам запрос
+    """
+    try:
+        translations = await chatgpt.translate_batch(
+            {post_id: post.text for post_id, post in batch.items()},
+            prompt_path,
+            timeout=timeout,
+            semaphore=_get_semaphore()
+        )
+    except Exception as e:
+        logger.exception(f"Ошибка при переводе постов: {str(e)}")
+        return list(batch.values())
+
+    result = []
+    for post_id, post in batch.items():
+        translation = translations.get(post_id)
+        if translation is None:
+            result.append(post)
+            continue
+        translation_cache.set(keys[post_id], translation)
+        result.append(post.with_translation(translation))
+    return result
+
+
+async def translation_stage(
+        posts: List[Post],
+        prompt_path: str = "prompts/translation_prompt.txt",
+        timeout: float | None = None,
+        mode: str = 'auto'
+) -> AsyncIterator[Post]:
+    """
+    Стадия перевода: выдает посты по мере готовности перевода
+    Посты, которым перевод не нужен (см. should_translate), и найденные в кэше отдаются сразу, остальные переводятся пакетами
+    параллельно (не больше TRANSLATION_CONCURRENCY запросов); посты, перевод которых
+    не уложился в дедлайн запроса, отдаются без перевода
+    :param posts: Посты
+    :param prompt_path: Путь к файлу с промптом
+    :param timeout: Дедлайн на один запрос к OpenAI (по умолчанию TRANSLATION_TIMEOUT)
+    :param mode: Режим перевода канала (auto / always / never)
+    """
+    timeout = timeout if timeout is not None else config.TRANSLATION_TIMEOUT
+    keys: Dict[str, str] = {}
+    pending: Dict[str, Post] = {}
+    for post in posts:
+        if post.id in keys or not should_translate(post, mode):
+            yield post
+            continue
+        key = chatgpt.translation_key(post.text, prompt_path)
+        keys[post.id] = key
+        cached = translation_cache.get(key)
+        if cached is not None:
+            yield post.with_translation(cached)
+        else:
+            pending[post.id] = post
+
+    if not pending:
+        return
+
+    batches = chatgpt.plan_batches({post_id: post.text for post_id, post in pending.items()})
+    tasks = [
+        asyncio.create_task(_translate_batch({post_id: pending[post_id] for post_id in batch}, keys, prompt_path, timeout))
+        for batch in batches
+    ]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            for post in await finished:
+                yield post
+    finally:
+        # Потребитель прервал итерацию - не оставляем висящих запросов
+        for task in tasks:
+            task.cancel()
+
+
+async def translate_posts(posts: List[Post], prompt_path: str = "prompts/translation_prompt.txt", mode: str = 'auto') -> List[Post]:
+    """
+    Переводит несколько постов: сначала кэш, остальные - пакетными запросами
+    :param posts: Посты
+    :param prompt_path: Путь к файлу с промптом
+    :param mode: Режим перевода канала (auto / always / never)
+    :return: Посты в том же порядке; не переведенные возвращаются без изменений
+    """
+    translated = {post.id: post async for post in translation_stage(posts, prompt_path, mode=mode)}
+    return [translated.get(post.id, post) for post in posts]
@@ -1,6 +1,6 @@
 # models.py
 
-from sqlalchemy import Column, Integer, String, Table, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Table, ForeignKey, DateTime, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base  # Импортируем Base из database
 
@@ -39,6 +39,57 @@ class Channel(Base):
         back_populates="channels"
     )
     
+class TwitterUserCache(Base):
+    """Кэш соответствия username -> rest_id (rest_id = NULL для несуществующих аккаунтов)"""
+    __tablename__ = 'twitter_user_cache'
+    
+    username = Column(String, primary_key=True)  # В нижнем регистре
+    rest_id = Column(String, nullable=True)
+    resolved_at = Column(DateTime, nullable=False)
+    
+class SeenTweet(Base):
+    """Твиты, уже доставленные по каналу (для дедупликации по rest_id)"""
+    __tablename__ = 'seen_tweets'
+    
+    channel_twitter_id = Column(String, primary_key=True)
+    tweet_id = Column(String, primary_key=True)
+    seen_at = Column(DateTime, nullable=False, index=True)
+    
+class TranslationCache(Base):
+    """Кэш переводов: ключ - sha256 от модели, промпта и текста"""
+    __tablename__ = 'translation_cache'
+    
+    key = Column(String(64), primary_key=True)
+    translation = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    last_used_at = Column(DateTime, nullable=False, index=True)
+    
+class ChannelSettings(Base):
+    """Настройки канала (отдельная таблица, чтобы не менять схему channels)"""
+    __tablename__ = 'channel_settings'
+    
+    channel_id = Column(Integer, ForeignKey('channels.id', ondelete='CASCADE'), primary_key=True)
+    # auto - переводить, если текст не на целевом языке; always - всегда; never - никогда
+    translation_mode = Column(String, nullable=False, default='auto')
+    
+class OutboxMessage(Base):
+    """Очередь доставки: строка на пару (пост, получатель); статусы pending / in_progress / sent / failed"""
+    __tablename__ = 'outbox'
+    __table_args__ = (UniqueConstraint('post_id', 'chat_id', name='uq_outbox_post_chat'),)
+    
+    id = Column(Integer, primary_key=True)
+    channel_twitter_id = Column(String, nullable=False)
+    post_id = Column(String, nullable=False)
+    chat_id = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # Post.to_json() уже переведенного поста
+    status = Column(String, nullable=False, default='pending', index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)  # Для in_progress - окончание аренды
+    steps_sent = Column(Integer, nullable=False, default=0)  # Сколько шагов плана отправки уже доставлено
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime)
+    
 class ScheduleSettings(Base):
     __tablename__ = 'schedule_settings'
     
@@ -1,4 +1,6 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
+from datetime import datetime
  
 from . import models
 
@@ -149,4 +151,51 @@ def update_schedule_settings(db: Session, hours: str) -> models.ScheduleSettings
     settings.hours = hours
     db.commit()
     db.refresh(settings)
-    return settings
\ No newline at end of file
+    return settings
+
+
+def get_channel_by_name(db: Session, name: str):
+    return db.query(models.Channel).filter(
+        func.lower(models.Channel.name) == name.lower()
+    ).first()
+
+
+def get_cached_twitter_user(db: Session, username: str):
+    return db.query(models.TwitterUserCache).filter(
+        models.TwitterUserCache.username == username.lower()
+    ).first()
+
+
+def save_cached_twitter_user(db: Session, username: str, rest_id: str | None):
+    """Сохраняет (или обновляет) результат поиска username -> rest_id"""
+    entry = get_cached_twitter_user(db, username)
+    if not entry:
+        entry = models.TwitterUserCache(username=username.lower())
+        db.add(entry)
+    entry.rest_id = rest_id
+    entry.resolved_at = datetime.utcnow()
+    db.commit()
+    return entry
+
+
+TRANSLATION_MODES = ('auto', 'always', 'never')
+
+
+def get_translation_modes(db: Session) -> dict:
+    """Режимы перевода по каналам: {channel_id: mode} (каналы без настроек - 'auto')"""
+    return {
+        settings.channel_id: settings.translation_mode
+        for settings in db.query(models.ChannelSettings).all()
+    }
+
+
+def set_translation_mode(db: Session, channel_id: int, mode: str) -> models.ChannelSettings:
+    if mode not in TRANSLATION_MODES:
+        raise ValueError(f"Неизвестный режим перевода: {mode}")
+    settings = db.query(models.ChannelSettings).filter(models.ChannelSettings.channel_id == channel_id).first()
+    if not settings:
+        settings = models.ChannelSettings(channel_id=channel_id)
+        db.add(settings)
+    settings.translation_mode = mode
+    db.commit()
+    return settings
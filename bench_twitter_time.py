@@ -0,0 +1,56 @@
+"""
+Микробенчмарк разбора времени твитов:
+старый путь (strptime + strftime + сравнение строк) против parse_twitter_time (unix-время).
+
+    python bench_twitter_time.py
+"""
+import random
+import time
+import timeit
+from datetime import datetime, timezone
+
+from services.twitter_time import parse_twitter_time
+
+
+N = 10_000
+REPEAT = 5
+
+random.seed(42)
+samples = [
+    time.strftime('%a %b %d %H:%M:%S +0000 %Y', time.gmtime(random.randint(1_600_000_000, 1_800_000_000)))
+    for _ in range(N)
+]
+min_created_at = datetime(2023, 1, 1)
+min_created_at_str = min_created_at.strftime('%Y-%m-%d-%H-%M-%S')
+min_created_at_epoch = int(min_created_at.replace(tzinfo=timezone.utc).timestamp())
+
+
+def old_path():
+    # Как было: strptime -> strftime, затем сравнение строк
+    count = 0
+    for value in samples:
+        created_at = datetime.strptime(value, '%a %b %d %H:%M:%S %z %Y').strftime('%Y-%m-%d-%H-%M-%S')
+        if created_at > min_created_at_str:
+            count += 1
+    return count
+
+
+def new_path():
+    # Как стало: быстрый разбор в unix-время, сравнение чисел
+    count = 0
+    for value in samples:
+        if parse_twitter_time(value) > min_created_at_epoch:
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    assert old_path() == new_path(), "Результаты фильтрации не совпадают"
+
+    old = min(timeit.repeat(old_path, number=1, repeat=REPEAT))
+    new = min(timeit.repeat(new_path, number=1, repeat=REPEAT))
+
+    print(f"Твитов: {N}")
+    print(f"strptime/strftime: {old * 1e6 / N:.2f} мкс/твит")
+    print(f"parse_twitter_time: {new * 1e6 / N:.2f} мкс/твит")
+    print(f"Ускорение: x{old / new:.1f}")
@@ -11,7 +11,10 @@ from apscheduler.triggers.cron import CronTrigger
 
 from app.database import init_db, SessionLocal
 from app.handlers import admin, editor, start
+from app.handlers.utils_delivery import telegram_throttle
+from app.handlers.utils_outbox import outbox
 from app.utils import get_schedule_settings
+from services.http_session import close_session
 from config import config
 
 # Настройка логгера
@@ -23,6 +26,8 @@ logger = logging.getLogger(__name__)
 
 # Глобальные переменные
 bot = Bot(token=os.getenv("TELEGRAM_BOT_TOKEN"))
+# Все исходящие запросы идут через лимиты Telegram (общий и на чат)
+bot.session.middleware(telegram_throttle)
 dp = Dispatcher(storage=MemoryStorage())
 scheduler = AsyncIOScheduler()
 
@@ -35,6 +40,9 @@ async def on_startup():
     init_db()  # Инициализация таблиц БД
     logger.info("✅ База данных инициализирована")
     
+    # Воркеры доставки: сразу подхватят то, что осталось в очереди с прошлого запуска
+    outbox.start(bot)
+    
     # Запускаем планировщик
     scheduler.start()
     logger.info("⏰ Планировщик запущен")
@@ -93,7 +101,12 @@ async def main():
     
     # Запускаем бота
     logger.info("🤖 Бот запускается...")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await outbox.stop()
+        # Закрываем общий пул HTTP-соединений
+        await close_session()
 
 if __name__ == "__main__":
     try:
@@ -14,12 +14,113 @@ class Config:
     # Twitter API
     TWITTER_API_HOST = os.getenv('TWITTER_API_HOST', 'twitter241.p.rapidapi.com')
     TWITTER_API_KEY = os.getenv('TWITTER_API_KEY')
-    
+    # Несколько ключей через запятую - запросы распределяются по остатку квоты
+    TWITTER_API_KEYS = [
+        key.strip() for key in (os.getenv('TWITTER_API_KEYS') or os.getenv('TWITTER_API_KEY') or '').split(',')
+        if key.strip()
+    ]
+    TWITTER_API_SCHEME = os.getenv('TWITTER_API_SCHEME', 'https')  # http - для fake_twitter_api.py
+
+    # HTTP (общий пул соединений)
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+
+    # Пейсинг запросов к Twitter API
+    TWITTER_MAX_RPS = float(os.getenv('TWITTER_MAX_RPS', '5'))
+    TWITTER_BURST = float(os.getenv('TWITTER_BURST', '5'))
+    TWITTER_QUOTA_RESERVE = int(os.getenv('TWITTER_QUOTA_RESERVE', '0'))
+    TWITTER_QUOTA_LOW_WATER = int(os.getenv('TWITTER_QUOTA_LOW_WATER', '50'))  # Ниже этого остатка запросы замедляются
+    TWITTER_RATE_LIMIT_BACKOFF = float(os.getenv('TWITTER_RATE_LIMIT_BACKOFF', '2'))  # Пауза после 429 при неисчерпанной квоте
+    TWITTER_MAX_WAIT = float(os.getenv('TWITTER_MAX_WAIT', '300'))  # Дольше ждать сброса квоты не будем - запрос завершится ошибкой
+    TWITTER_RATE_LIMIT_RETRIES = int(os.getenv('TWITTER_RATE_LIMIT_RETRIES', '3'))
+
+    # Повторы временных ошибок и предохранитель Twitter API
+    TWITTER_RETRIES = int(os.getenv('TWITTER_RETRIES', '3'))
+    TWITTER_BACKOFF_BASE = float(os.getenv('TWITTER_BACKOFF_BASE', '0.5'))
+    TWITTER_BACKOFF_MAX = float(os.getenv('TWITTER_BACKOFF_MAX', '8'))
+    TWITTER_BREAKER_THRESHOLD = int(os.getenv('TWITTER_BREAKER_THRESHOLD', '5'))
+    TWITTER_BREAKER_RECOVERY = float(os.getenv('TWITTER_BREAKER_RECOVERY', '60'))
+
+    # Кэш username -> rest_id
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '4096'))
+    USER_CACHE_TTL_HOURS = float(os.getenv('USER_CACHE_TTL_HOURS', '720'))
+    USER_CACHE_NEGATIVE_TTL_HOURS = float(os.getenv('USER_CACHE_NEGATIVE_TTL_HOURS', '24'))
+
+    # Загрузка ленты: размер страницы подбирается по частоте постинга канала
+    TWITTER_PAGE_SIZE_DEFAULT = int(os.getenv('TWITTER_PAGE_SIZE_DEFAULT', '20'))
+    TWITTER_PAGE_SIZE_MIN = int(os.getenv('TWITTER_PAGE_SIZE_MIN', '5'))
+    TWITTER_PAGE_SIZE_MAX = int(os.getenv('TWITTER_PAGE_SIZE_MAX', '40'))
+    TWITTER_MAX_PAGES = int(os.getenv('TWITTER_MAX_PAGES', '5'))
+
+    # Выбор варианта видео: лимит размера для отправки по URL и кэш проверок размера по media_key
+    TELEGRAM_VIDEO_MAX_MB = int(os.getenv('TELEGRAM_VIDEO_MAX_MB', '20'))
+    VIDEO_PROBE_CACHE_SIZE = int(os.getenv('VIDEO_PROBE_CACHE_SIZE', '4096'))
+    VIDEO_PROBE_CACHE_TTL_HOURS = float(os.getenv('VIDEO_PROBE_CACHE_TTL_HOURS', '168'))
+
+    # Индекс просмотренных твитов
+    SEEN_TWEETS_RETENTION_DAYS = int(os.getenv('SEEN_TWEETS_RETENTION_DAYS', '14'))
+    SEEN_BLOOM_CAPACITY = int(os.getenv('SEEN_BLOOM_CAPACITY', '2000'))
+
+    # Обновление каналов
+    FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', '10'))
+    # Сколько каналов одновременно проходят пробу видео, перевод и постановку в очередь
+    CHANNEL_CONCURRENCY = int(os.getenv('CHANNEL_CONCURRENCY', '4'))
+
+    # Доставка в Telegram: сколько file_id медиа (по URL) держать для повторной отправки
+    TELEGRAM_FILE_ID_CACHE_SIZE = int(os.getenv('TELEGRAM_FILE_ID_CACHE_SIZE', '1024'))
+    # Лимиты Telegram: ~30 сообщений/сек на бота и ~1 сообщение/сек в чат (короткие всплески допустимы)
+    TELEGRAM_GLOBAL_RPS = float(os.getenv('TELEGRAM_GLOBAL_RPS', '30'))
+    TELEGRAM_CHAT_RPS = float(os.getenv('TELEGRAM_CHAT_RPS', '1'))
+    TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+    TELEGRAM_RETRY_ATTEMPTS = int(os.getenv('TELEGRAM_RETRY_ATTEMPTS', '3'))
+    # Сколько получателей обслуживать одновременно
+    DELIVERY_CONCURRENCY = int(os.getenv('DELIVERY_CONCURRENCY', '20'))
+    # Кэш медиа на диске: загрузка файла в Telegram, если тот не смог скачать его по URL
+    MEDIA_CACHE_DIR = os.getenv('MEDIA_CACHE_DIR', 'media_cache')
+    MEDIA_CACHE_MAX_MB = int(os.getenv('MEDIA_CACHE_MAX_MB', '1024'))
+    MEDIA_MAX_FILE_MB = int(os.getenv('MEDIA_MAX_FILE_MB', '50'))  # Лимит загрузки файла ботом
+    MEDIA_PREFETCH_CONCURRENCY = int(os.getenv('MEDIA_PREFETCH_CONCURRENCY', '4'))
+    # Очередь доставки (outbox): воркеры, максимум получателей за захват, попытки, интервал опроса (сек), хранение отправленных
+    OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', '4'))
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+    OUTBOX_RETRY_BASE = float(os.getenv('OUTBOX_RETRY_BASE', '30'))
+    OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '30'))
+    OUTBOX_LEASE_SECONDS = float(os.getenv('OUTBOX_LEASE_SECONDS', '600'))  # Через сколько захваченная строка считается брошенной
+    OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+
     # GPT
     GPT_API_KEY = os.getenv('GPT_API_KEY')
     GPT_MODEL = os.getenv('GPT_MODEL')
     GPT_TEMPERATURE = float(os.getenv('GPT_TEMPERATURE', '0.7'))
     GPT_MAX_TOKENS = int(os.getenv('GPT_MAX_TOKENS', '1500'))
+    # Маршрутизация: короткие тексты (до GPT_FAST_MAX_CHARS символов) - на быструю модель, если она задана
+    GPT_FAST_MODEL = os.getenv('GPT_FAST_MODEL')
+    GPT_FAST_MAX_CHARS = int(os.getenv('GPT_FAST_MAX_CHARS', '280'))
+    # Хеджирование: если запрос дольше перцентиля латентности таких же запросов (модель, пакет или одиночный) -
+    # параллельно отправляем дубль; пока замеров меньше GPT_HEDGE_MIN_SAMPLES, не хеджируем
+    GPT_HEDGE_PERCENTILE = float(os.getenv('GPT_HEDGE_PERCENTILE', '95'))
+    GPT_HEDGE_MIN_SAMPLES = int(os.getenv('GPT_HEDGE_MIN_SAMPLES', '20'))
+    # Пакетный перевод: бюджет входных токенов на один запрос и максимум постов в пакете
+    GPT_BATCH_TOKEN_BUDGET = int(os.getenv('GPT_BATCH_TOKEN_BUDGET', '3000'))
+    GPT_BATCH_MAX_POSTS = int(os.getenv('GPT_BATCH_MAX_POSTS', '10'))
+
+    # Кэш переводов
+    TRANSLATION_CACHE_SIZE = int(os.getenv('TRANSLATION_CACHE_SIZE', '2048'))
+    TRANSLATION_CACHE_TTL_DAYS = int(os.getenv('TRANSLATION_CACHE_TTL_DAYS', '30'))
+    TRANSLATION_CACHE_MAX_ROWS = int(os.getenv('TRANSLATION_CACHE_MAX_ROWS', '50000'))
+    # Параллельный перевод: сколько запросов к OpenAI одновременно и дедлайн (сек) на один запрос
+    TRANSLATION_CONCURRENCY = int(os.getenv('TRANSLATION_CONCURRENCY', '4'))
+    TRANSLATION_TIMEOUT = float(os.getenv('TRANSLATION_TIMEOUT', '30'))
+    # Локальный пре-фильтр: язык перевода и доля букв его письменности, при которой перевод не нужен
+    TRANSLATION_TARGET_LANG = os.getenv('TRANSLATION_TARGET_LANG', 'ru')
+    TRANSLATION_SKIP_THRESHOLD = float(os.getenv('TRANSLATION_SKIP_THRESHOLD', '0.6'))
+
+    # Промпты
+    PROMPTS_DIR = os.getenv('PROMPTS_DIR', 'prompts')
+    PROMPT_RELOAD_INTERVAL = float(os.getenv('PROMPT_RELOAD_INTERVAL', '2'))
     
     # Database
     DB_HOST = os.getenv('DB_HOST', 'db')
@@ -37,8 +138,8 @@ class Config:
     
     @property
     def DATABASE_URL(self) -> str:
-        """Строка подключения к PostgreSQL"""
-        return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        """Строка подключения к PostgreSQL (драйвер psycopg2 из requirements.txt - SQLAlchemy 2.1 по умолчанию берет psycopg 3)"""
+        return f"postgresql+psycopg2://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
     def is_admin(self, user_id: int) -> bool:
         """Проверяет, является ли пользователь администратором"""
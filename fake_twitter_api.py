@@ -0,0 +1,333 @@
+"""
+Локальная замена RapidAPI twitter241 для офлайн-тестов и бенчмарков.
+
+Обслуживает эндпоинты /user и /user-tweets:
+- синтетические ленты (детерминированные для каждого user id) с курсорами и медиа;
+- сами медиафайлы по /media/... (с --media-base ссылки в ленте ведут на этот сервер);
+- воспроизведение записанных ответов из каталога (--fixtures);
+- запись ответов настоящего API в каталог (--record, ключ берется из TWITTER_API_KEY);
+- внедрение задержек, ответов 429 с заголовками x-ratelimit-* и ошибок 5xx.
+
+Запуск:
+    python fake_twitter_api.py --port 8080 --latency 200 --error-rate 0.05 --quota 100
+
+Клиент направляется на сервер через окружение:
+    TWITTER_API_HOST=localhost:8080 TWITTER_API_SCHEME=http
+
+Проверка загрузки медиа (кэш на диске, отправка файлом):
+    python fake_twitter_api.py --media-base http://localhost:8080 --media-size 512
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger("fake_twitter_api")
+
+UPSTREAM_HOST = 'twitter241.p.rapidapi.com'
+
+
+def _twitter_time(epoch: int) -> str:
+    return time.strftime('%a %b %d %H:%M:%S +0000 %Y', time.gmtime(epoch))
+
+
+def _seed(*parts) -> int:
+    return int(hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()[:12], 16)
+
+
+class SyntheticTimeline:
+    """
+    Детерминированная лента: для каждого user id - своя частота постинга,
+    твиты идут от текущего момента назад с шагом ~1/частота
+    """
+
+    def __init__(self, posts_per_hour: float, media_ratio: float, media_base: str | None = None):
+        self.posts_per_hour = posts_per_hour
+        self.media_ratio = media_ratio
+        self.media_base = media_base.rstrip('/') if media_base else None
+
+    def _media_url(self, host: str, path: str) -> str:
+        """Ссылка на медиа: настоящий хост Twitter или /media/<host>/<path> этого сервера"""
+        if self.media_base:
+            return f"{self.media_base}/media/{host}/{path}"
+        return f"https://{host}/{path}"
+
+    def _interval(self, user: str) -> int:
+        # Разброс частоты постинга между пользователями: x0.25 .. x4
+        factor = 0.25 * (2 ** (_seed(user) % 5))
+        return max(60, int(3600 / (self.posts_per_hour * factor)))
+
+    def _media(self, user: str, index: int, tweet_id: str) -> list:
+        rnd = random.Random(_seed(user, index, 'media'))
+        if rnd.random() >= self.media_ratio:
+            return []
+
+        kind = rnd.choice(['photo', 'photo', 'video', 'animated_gif'])
+        media_key = f"{rnd.randint(3, 16)}_{tweet_id}"
+        if kind == 'photo':
+            return [
+                {'type': 'photo', 'media_key': f"{media_key}{n}",
+                 'media_url_https': self._media_url("pbs.twimg.com", f"media/{tweet_id}_{n}.jpg")}
+                for n in range(rnd.randint(1, 4))
+            ]
+
+        duration = rnd.randint(5_000, 600_000)
+        return [{
+            'type': kind,
+            'media_key': media_key,
+            'media_url_https': self._media_url("pbs.twimg.com", f"ext_tw_video_thumb/{tweet_id}/pu/img/thumb.jpg"),
+            'video_info': {
+                'duration_millis': duration,
+                'variants': [
+                    {'content_type': 'application/x-mpegURL',
+                     'url': self._media_url("video.twimg.com", f"ext_tw_video/{tweet_id}/pu/pl/playlist.m3u8")},
+                    {'bitrate': 256000, 'content_type': 'video/mp4',
+                     'url': self._media_url("video.twimg.com", f"ext_tw_video/{tweet_id}/pu/vid/480x270/v.mp4")},
+                    {'bitrate': 832000, 'content_type': 'video/mp4',
+                     'url': self._media_url("video.twimg.com", f"ext_tw_video/{tweet_id}/pu/vid/640x360/v.mp4")},
+                    {'bitrate': 2176000, 'content_type': 'video/mp4',
+                     'url': self._media_url("video.twimg.com", f"ext_tw_video/{tweet_id}/pu/vid/1280x720/v.mp4")},
+                ]
+            }
+        }]
+
+    def _tweet(self, user: str, index: int, created_at: int) -> dict:
+        tweet_id = str(1_800_000_000_000_000_000 + created_at * 1000 + _seed(user) % 1000)
+        rnd = random.Random(_seed(user, index))
+        text = f"Synthetic tweet #{index} from {user}"
+        if rnd.random() < 0.3:
+            text += f" https://t.co/{tweet_id[-8:]}"
+        if rnd.random() < 0.1:
+            text = "RT @someone: " + text
+
+        legacy = {
+            'full_text': text,
+            'created_at': _twitter_time(created_at),
+            'is_quote_status': rnd.random() < 0.1,
+        }
+        media = self._media(user, index, tweet_id)
+        if media:
+            legacy['extended_entities'] = {'media': media}
+
+        return {
+            'entryId': f"tweet-{tweet_id}",
+            'content': {'itemContent': {
+                'itemType': 'TimelineTweet',
+                'tweet_results': {'result': {'__typename': 'Tweet', 'rest_id': tweet_id, 'legacy': legacy}}
+            }}
+        }
+
+    def page(self, user: str, count: int, cursor: str | None) -> dict:
+        interval = self._interval(user)
+        # Привязываем ленту к сетке, чтобы повторные запросы давали те же твиты
+        newest = int(time.time()) // interval * interval
+        offset = int(cursor) if cursor and cursor.isdigit() else 0
+
+        entries = [
+            self._tweet(user, offset + i, newest - (offset + i) * interval)
+            for i in range(count)
+        ]
+        entries.append({'entryId': f"cursor-bottom-{offset + count}",
+                        'content': {'cursorType': 'Bottom', 'value': str(offset + count)}})
+
+        instructions = [{'type': 'TimelineAddEntries', 'entries': entries}]
+        if offset == 0:
+            pinned = self._tweet(user, -1, newest - 90 * 86400)
+            pinned['entryId'] = 'tweet-pinned'
+            instructions.insert(0, {'type': 'TimelinePinEntry', 'entry': pinned})
+
+        return {
+            'cursor': {'bottom': str(offset + count), 'top': '0'},
+            'result': {'timeline': {'instructions': instructions}}
+        }
+
+    @staticmethod
+    def user(username: str) -> dict:
+        if username.lower().startswith('missing'):
+            # Так API отвечает на несуществующий аккаунт
+            return {'result': {'data': {'user': {}}}}
+        rest_id = str(_seed(username.lower()) % 10 ** 10)
+        return {'result': {'data': {'user': {'result': {
+            '__typename': 'User', 'rest_id': rest_id, 'legacy': {'screen_name': username}
+        }}}}}
+
+
+class FakeTwitterApi:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.timeline = SyntheticTimeline(args.posts_per_hour, args.media_ratio, args.media_base)
+        self.fixtures = Path(args.fixtures) if args.fixtures else None
+        self.record_dir = Path(args.record) if args.record else None
+        # Квота считается отдельно по каждому ключу (x-rapidapi-key): ключ -> [начало окна, использовано]
+        self.windows: dict[str, list] = {}
+        self.stats = {'requests': 0, 'rate_limited': 0, 'errors': 0, 'media': 0}
+
+    # --- Квота -----------------------------------------------------------------
+
+    def _window(self, request: web.Request) -> list:
+        key = request.headers.get('x-rapidapi-key', '')
+        now = time.monotonic()
+        window = self.windows.setdefault(key, [now, 0])
+        if now - window[0] >= self.args.window:
+            window[0], window[1] = now, 0
+        return window
+
+    def _quota_headers(self, request: web.Request) -> dict:
+        if not self.args.quota:
+            return {}
+        window = self._window(request)
+        reset = max(1, math.ceil(self.args.window - (time.monotonic() - window[0])))
+        return {
+            'x-ratelimit-requests-limit': str(self.args.quota),
+            'x-ratelimit-requests-remaining': str(max(0, self.args.quota - window[1])),
+            'x-ratelimit-requests-reset': str(reset),
+        }
+
+    # --- Фикстуры ---------------------------------------------------------------
+
+    @staticmethod
+    def _fixture_name(endpoint: str, params: dict) -> str:
+        key = params.get('user') or params.get('username') or 'unknown'
+        name = f"{endpoint}_{key}"
+        if params.get('cursor'):
+            name += "_" + hashlib.sha1(params['cursor'].encode()).hexdigest()[:12]
+        return re.sub(r'[^\w.-]', '_', name) + ".json"
+
+    def _load_fixture(self, endpoint: str, params: dict) -> dict | None:
+        if not self.fixtures:
+            return None
+        path = self.fixtures / self._fixture_name(endpoint, params)
+        if path.exists():
+            return json.loads(path.read_text(encoding='utf-8'))
+        return None
+
+    async def _record(self, endpoint: str, params: dict) -> web.Response:
+        """Проксирует запрос в настоящий API и сохраняет ответ как фикстуру"""
+        headers = {'x-rapidapi-key': self.args.upstream_key, 'x-rapidapi-host': UPSTREAM_HOST}
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"https://{UPSTREAM_HOST}/{endpoint}", params=params, headers=headers) as response:
+                body = await response.text()
+                passthrough = {k: v for k, v in response.headers.items() if k.lower().startswith('x-ratelimit')}
+                if response.status == 200:
+                    self.record_dir.mkdir(parents=True, exist_ok=True)
+                    (self.record_dir / self._fixture_name(endpoint, params)).write_text(body, encoding='utf-8')
+                return web.Response(text=body, status=response.status, content_type='application/json', headers=passthrough)
+
+    # --- Обработка запросов -----------------------------------------------------
+
+    async def _prelude(self, request: web.Request) -> web.Response | None:
+        """Общая часть: задержка, квота, случайные ошибки"""
+        self.stats['requests'] += 1
+
+        if self.args.latency:
+            jitter = random.uniform(-self.args.jitter, self.args.jitter)
+            await asyncio.sleep(max(0.0, self.args.latency + jitter) / 1000)
+
+        if self.args.quota:
+            headers = self._quota_headers(request)
+            window = self._window(request)
+            if window[1] >= self.args.quota:
+                self.stats['rate_limited'] += 1
+                headers['retry-after'] = headers['x-ratelimit-requests-reset']
+                return web.json_response({'message': 'Too many requests'}, status=429, headers=headers)
+            window[1] += 1
+
+        if random.random() < self.args.error_rate:
+            self.stats['errors'] += 1
+            status = random.choice([500, 502, 503, 504])
+            return web.json_response({'message': f'Injected error {status}'}, status=status)
+
+        return None
+
+    async def handle(self, request: web.Request, endpoint: str) -> web.Response:
+        early = await self._prelude(request)
+        if early is not None:
+            return early
+
+        params = dict(request.query)
+        if self.record_dir is not None:
+            return await self._record(endpoint, params)
+
+        payload = self._load_fixture(endpoint, params)
+        if payload is None:
+            if endpoint == 'user':
+                payload = self.timeline.user(params.get('username', ''))
+            else:
+                count = min(max(int(params.get('count', 20)), 1), 100)
+                payload = self.timeline.page(str(params.get('user', '')), count, params.get('cursor'))
+
+        return web.json_response(payload, headers=self._quota_headers(request))
+
+    async def handle_user(self, request: web.Request) -> web.Response:
+        return await self.handle(request, 'user')
+
+    async def handle_user_tweets(self, request: web.Request) -> web.Response:
+        return await self.handle(request, 'user-tweets')
+
+    async def handle_media(self, request: web.Request) -> web.Response:
+        """Медиафайл: детерминированные байты размером --media-size КБ (квота RapidAPI не действует)"""
+        self.stats['media'] += 1
+        if random.random() < self.args.media_error_rate:
+            return web.Response(status=random.choice([403, 404, 503]))
+
+        path = request.match_info['path']
+        size = self.args.media_size * 1024
+        # Видео: размер растет с разрешением варианта (480x270 - базовый --media-size)
+        resolution = re.search(r'/(\d+)x(\d+)/', path)
+        if resolution:
+            size *= int(resolution.group(1)) * int(resolution.group(2)) / (480 * 270)
+        body = random.Random(_seed(path)).randbytes(int(size))
+        content_type = {'.jpg': 'image/jpeg', '.mp4': 'video/mp4', '.m3u8': 'application/x-mpegURL'}.get(
+            Path(path).suffix, 'application/octet-stream'
+        )
+        return web.Response(body=body, content_type=content_type)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/user', self.handle_user)
+        app.router.add_get('/user-tweets', self.handle_user_tweets)
+        app.router.add_get('/media/{path:.+}', self.handle_media)
+        app.router.add_get('/_stats', self.handle_stats)
+        return app
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    import os
+
+    parser = argparse.ArgumentParser(description="Локальная замена RapidAPI twitter241")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help="Задержка ответа, мс")
+    parser.add_argument('--jitter', type=float, default=0, help="Разброс задержки, мс")
+    parser.add_argument('--error-rate', type=float, default=0, help="Доля ответов 5xx (0..1)")
+    parser.add_argument('--quota', type=int, default=0, help="Запросов на окно (0 - без лимита)")
+    parser.add_argument('--window', type=float, default=60, help="Длительность окна квоты, сек")
+    parser.add_argument('--posts-per-hour', type=float, default=2, help="Средняя частота постинга")
+    parser.add_argument('--media-ratio', type=float, default=0.5, help="Доля твитов с медиа")
+    parser.add_argument('--media-base', help="Адрес этого сервера для ссылок на медиа (например, http://localhost:8080)")
+    parser.add_argument('--media-size', type=float, default=256, help="Размер отдаваемого медиафайла, КБ")
+    parser.add_argument('--media-error-rate', type=float, default=0, help="Доля отказов при скачивании медиа (0..1)")
+    parser.add_argument('--fixtures', help="Каталог с записанными ответами для воспроизведения")
+    parser.add_argument('--record', help="Каталог для записи ответов настоящего API")
+    parser.add_argument('--upstream-key', default=os.getenv('TWITTER_API_KEY'), help="Ключ RapidAPI для --record")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    if args.record and not args.upstream_key:
+        raise SystemExit("Для --record нужен TWITTER_API_KEY или --upstream-key")
+    web.run_app(FakeTwitterApi(args).build_app(), host=args.host, port=args.port)
@@ -0,0 +1,41 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Компактный Bloom-фильтр для строковых ключей.
+    Ложноотрицательных ответов не бывает: "нет" - точно нет, "есть" - возможно есть.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        :param capacity: Ожидаемое количество элементов
+        :param error_rate: Допустимая доля ложноположительных ответов
+        """
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Двойное хеширование: k позиций из одного 128-битного дайджеста
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def saturated(self) -> bool:
+        """Фильтр заполнен сверх расчетной емкости - точность падает, пора перестроить"""
+        return self.count > self.capacity
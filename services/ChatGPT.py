@@ -1,13 +1,80 @@
+import asyncio
+import contextlib
+import hashlib
+import json
 import logging
+import time
+from typing import Awaitable, Callable, Dict, List
 from openai import AsyncOpenAI
 from config import config
+from services.LatencyTracker import LatencyTracker
+from services.PromptRegistry import prompts
 
 logger = logging.getLogger(__name__)
 
+# Инструкция к пакетному запросу: ответ строго в JSON с id постов
+BATCH_INSTRUCTION = (
+    "Тебе передан JSON-массив постов вида {\"id\": ..., \"text\": ...}. "
+    "Переведи текст каждого поста по правилам выше и верни только JSON-объект "
+    "{\"translations\": [{\"id\": ..., \"text\": ...}]} с теми же id, без пояснений и markdown."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов с запасом (~3 символа на токен)"""
+    return len(text) // 3 + 1
+
+
+def split_batches(items: Dict[str, str], token_budget: int, max_items: int) -> List[Dict[str, str]]:
+    """Делит тексты на пакеты, не превышающие бюджет токенов и максимум элементов"""
+    batches: List[Dict[str, str]] = []
+    current: Dict[str, str] = {}
+    current_tokens = 0
+    for item_id, text in items.items():
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = {}, 0
+        current[item_id] = text
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_response(content: str, expected_ids) -> Dict[str, str]:
+    """
+    Разбирает ответ пакетного запроса
+    :return: {id: перевод} только для ожидаемых id с непустым переводом
+    """
+    # Модель может обернуть JSON в ```json ... ``` - берем от первой { до последней }
+    start, end = content.find('{'), content.rfind('}')
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(content[start:end + 1])
+        items = data['translations']
+    except (ValueError, KeyError, TypeError):
+        return {}
+
+    expected = set(expected_ids)
+    result = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        item_id, text = str(item.get('id')), item.get('text')
+        if item_id in expected and isinstance(text, str) and text.strip():
+            result[item_id] = text.strip()
+    return result
+
 class ChatGPT:
+    # Замеры латентности общие для всех клиентов процесса
+    latency = LatencyTracker()
+
     def __init__(self):
         self.api_key = config.GPT_API_KEY
         self.model = config.GPT_MODEL
+        self.fast_model = config.GPT_FAST_MODEL
         self.temperature = config.GPT_TEMPERATURE
         self.max_tokens = config.GPT_MAX_TOKENS
         self.client = AsyncOpenAI(api_key=self.api_key) if self.api_key else None
@@ -15,32 +82,182 @@ class ChatGPT:
         if not self.api_key:
             logger.warning("GPT_API_KEY не установлен! Функции перевода будут недоступны")
 
-    async def generate_translation(self, text: str, prompt_path: str = "prompts/translation_prompt.txt") -> str:
-        if not self.client:
-            return text
-            
+    def choose_model(self, text: str) -> str:
+        """Короткие тексты - быстрой модели (если задана), остальные - основной"""
+        if self.fast_model and len(text) <= config.GPT_FAST_MAX_CHARS:
+            return self.fast_model
+        return self.model
+
+    def translation_key(self, text: str, prompt_path: str = "prompts/translation_prompt.txt") -> str:
+        """Ключ перевода: хеш модели, текста промпта и исходного текста"""
+        digest = hashlib.sha256()
+        for part in (self.choose_model(text) or '', prompts.get(prompt_path), text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def plan_batches(self, texts: Dict[str, str]) -> List[Dict[str, str]]:
+        """Делит тексты на пакеты: сначала по модели, затем по бюджету токенов"""
+        by_model: Dict[str, Dict[str, str]] = {}
+        for item_id, text in texts.items():
+            by_model.setdefault(self.choose_model(text), {})[item_id] = text
+        batches = []
+        for group in by_model.values():
+            batches += split_batches(group, config.GPT_BATCH_TOKEN_BUDGET, config.GPT_BATCH_MAX_POSTS)
+        return batches
+
+    @staticmethod
+    def latency_key(model: str, kind: str) -> str:
+        """Ключ замеров: модель и вид запроса (batch / single) - у пакетов своя латентность"""
+        return f"{model}/{kind}"
+
+    def hedge_delay(self, key: str) -> float | None:
+        """
+        Через сколько секунд без ответа отправлять дублирующий запрос
+        :return: None - замеров для такого запроса пока мало, не хеджируем
+        """
+        if self.latency.count(key) < config.GPT_HEDGE_MIN_SAMPLES:
+            return None
+        return self.latency.percentile(key, config.GPT_HEDGE_PERCENTILE)
+
+    async def _complete(self, model: str, messages: list, key: str) -> str | None:
+        """Один запрос к модели с замером длительности (замер пишется под ключом key)"""
+        started = time.monotonic()
         try:
-            # Загружаем промпт из файла
-            with open(prompt_path, "r", encoding="utf-8") as f:
-                system_prompt = f.read().strip()
-            
-            # logger.info('Используем модель: ' + self.model)  # Логируем начало запроса
-            # Формируем запрос через новый API
             response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ],
+                model=model,
+                messages=messages,
                 # temperature=self.temperature,
                 # max_tokens=self.max_tokens
             )
+        except asyncio.CancelledError:
+            # Отмененный медленный запрос - тоже замер, иначе хвост латентности пропадет из статистики
+            self.latency.record(key, time.monotonic() - started)
+            raise
+        self.latency.record(key, time.monotonic() - started)
+
+        if response.choices and response.choices[0].message.content:
+            return response.choices[0].message.content.strip()
+        return None
+
+    async def _hedged_complete(self, model: str, messages: list, kind: str = 'single') -> str | None:
+        """
+        Запрос с хеджированием: если ответа нет дольше перцентиля латентности таких же запросов
+        (та же модель и вид - пакет или одиночный), отправляется дубль; берется первый успешный ответ,
+        второй запрос отменяется. Пока замеров меньше GPT_HEDGE_MIN_SAMPLES, дубль не отправляется
+        """
+        key = self.latency_key(model, kind)
+        delay = self.hedge_delay(key)
+        if delay is None:
+            return await self._complete(model, messages, key)
+
+        pending = {asyncio.create_task(self._complete(model, messages, key))}
+        error = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return done.pop().result()
+
+            logger.info("Перевод моделью %s дольше %.1f сек, отправляем дублирующий запрос", model, delay)
+            pending.add(asyncio.create_task(self._complete(model, messages, key)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def request_translation(self, text: str, prompt_path: str = "prompts/translation_prompt.txt") -> str | None:
+        """Переводит текст; None - если перевод недоступен или запрос не удался"""
+        if not self.client:
+            return None
+            
+        try:
+            # Промпт из реестра (в памяти, перечитывается только при изменении файла)
+            system_prompt = prompts.get(prompt_path)
             
-            # Извлекаем результат
-            if response.choices and response.choices[0].message.content:
-                return response.choices[0].message.content.strip()
-            return text
+            return await self._hedged_complete(self.choose_model(text), [
+                {"role": "user", "content": system_prompt},
+                {"role": "user", "content": text}
+            ])
         
         except Exception as e:
             logger.exception(f"Ошибка при переводе: {str(e)}")
-            return text
\ No newline at end of file
+            return None
+
+    async def generate_translation(self, text: str, prompt_path: str = "prompts/translation_prompt.txt") -> str:
+        """Переводит текст; при ошибке возвращает исходный текст"""
+        translation = await self.request_translation(text, prompt_path)
+        return translation if translation is not None else text
+
+    async def _request_batch(self, batch: Dict[str, str], prompt_path: str) -> Dict[str, str]:
+        """Один запрос на пакет постов; пустой словарь при ошибке или неразборчивом ответе"""
+        payload = json.dumps([{"id": item_id, "text": text} for item_id, text in batch.items()], ensure_ascii=False)
+        # Пакеты собираются plan_batches, все тексты пакета идут на одну модель
+        model = self.choose_model(next(iter(batch.values())))
+        try:
+            content = await self._hedged_complete(model, [
+                {"role": "user", "content": prompts.get(prompt_path) + "\n\n" + BATCH_INSTRUCTION},
+                {"role": "user", "content": payload}
+            ], kind='batch')
+        except Exception as e:
+            logger.exception(f"Ошибка при пакетном переводе: {str(e)}")
+            return {}
+
+        return parse_batch_response(content or '', batch.keys())
+
+    async def _limited(self, request: Callable[[], Awaitable], timeout: float | None, semaphore: asyncio.Semaphore | None):
+        """
+        Один запрос к OpenAI со своим дедлайном; ожидание слота семафора в дедлайн не входит
+        :return: Результат запроса или None при таймауте
+        """
+        async with semaphore or contextlib.nullcontext():
+            try:
+                return await asyncio.wait_for(request(), timeout) if timeout else await request()
+            except asyncio.TimeoutError:
+                logger.warning("Запрос перевода не уложился в %s сек", timeout)
+                return None
+
+    async def translate_batch(
+            self,
+            texts: Dict[str, str],
+            prompt_path: str = "prompts/translation_prompt.txt",
+            timeout: float | None = None,
+            semaphore: asyncio.Semaphore | None = None
+    ) -> Dict[str, str | None]:
+        """
+        Переводит несколько текстов, упаковывая их в пакеты по модели и бюджету токенов
+        Дедлайн timeout действует на каждый запрос отдельно, поэтому переводы, полученные
+        до таймаута другого запроса, не теряются. Посты, которых нет в ответе пакета,
+        переводятся по одному параллельно (каждый запрос занимает слот semaphore)
+        :param texts: {id: текст}
+        :param timeout: Дедлайн на один запрос к OpenAI (None - без дедлайна)
+        :param semaphore: Общий лимит одновременных запросов
+        :return: {id: перевод или None, если перевести не удалось}
+        """
+        if not self.client or not texts:
+            return {item_id: None for item_id in texts}
+
+        async def translate_one(text: str) -> str | None:
+            return await self._limited(lambda: self.request_translation(text, prompt_path), timeout, semaphore)
+
+        async def translate_planned(batch: Dict[str, str]) -> Dict[str, str | None]:
+            translated = {}
+            if len(batch) > 1:
+                # Одиночный пост нет смысла заворачивать в JSON
+                translated = await self._limited(lambda: self._request_batch(batch, prompt_path), timeout, semaphore) or {}
+            missing = [item_id for item_id in batch if item_id not in translated]
+            if len(batch) > 1 and missing:
+                logger.warning("Пакетный перевод: нет ответа для %s из %s постов, переводим по одному", len(missing), len(batch))
+            singles = await asyncio.gather(*(translate_one(batch[item_id]) for item_id in missing))
+            translated.update(zip(missing, singles))
+            return translated
+
+        result: Dict[str, str | None] = {}
+        for translated in await asyncio.gather(*(translate_planned(batch) for batch in self.plan_batches(texts))):
+            result.update(translated)
+        return result
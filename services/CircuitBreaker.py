@@ -0,0 +1,79 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная задержка с полным джиттером: случайно в [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего эндпоинта.
+    closed - запросы идут; после failure_threshold ошибок подряд - open: запросы сразу отклоняются;
+    через recovery_timeout - half_open: пропускается один пробный запрос.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Можно ли выполнять запрос прямо сейчас"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # half_open: только один пробный запрос за раз
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Предохранитель %s закрыт - эндпоинт снова отвечает", self.name)
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        "Предохранитель %s открыт на %.0f сек после %s ошибок",
+                        self.name, self.recovery_timeout, self.failures
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Запрос прерван без результата (например, задача отменена) - освобождает пробный слот half_open"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.recovery_timeout
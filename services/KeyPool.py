@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Mapping, Tuple
+
+from services.RateLimiter import QuotaExhaustedError, RateLimitPacer
+
+logger = logging.getLogger(__name__)
+
+
+class ApiKeyState:
+    """Состояние одного ключа RapidAPI: собственный пейсер и остаток квоты"""
+
+    def __init__(self, key: str, pacer: RateLimitPacer):
+        self.key = key
+        self.pacer = pacer
+        self.parked_until = 0.0
+        self.in_flight = 0
+        self.last_used = 0.0
+
+    @property
+    def label(self) -> str:
+        return f"…{self.key[-4:]}" if self.key else "—"
+
+    def headroom(self) -> float:
+        """Сколько запросов еще можно сделать по ключу (неизвестно - считаем неограниченным)"""
+        if self.pacer.remaining is None:
+            return float('inf')
+        return self.pacer.remaining - self.pacer.quota_reserve - self.in_flight
+
+
+class KeyPool:
+    """
+    Пул ключей RapidAPI: каждый запрос уходит на ключ с наибольшим остатком квоты,
+    исчерпанные ключи "паркуются" до сброса окна. Если все ключи запаркованы дольше max_wait,
+    запрос сразу получает QuotaExhaustedError
+    """
+
+    def __init__(self, keys: List[str], max_rate: float, burst: float, quota_reserve: int = 0,
+                 low_water: int = 0, backoff: float = 2.0, max_wait: float = 300.0):
+        if not keys:
+            keys = [None]
+        self.keys = [
+            ApiKeyState(key, RateLimitPacer(
+                max_rate=max_rate, burst=burst, quota_reserve=quota_reserve,
+                low_water=low_water, backoff=backoff, max_wait=max_wait
+            ))
+            for key in keys
+        ]
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+
+    def acquire_key(self) -> ApiKeyState:
+        """
+        Выбирает ключ для следующего запроса и резервирует его квоту
+        :raises QuotaExhaustedError: Все ключи запаркованы дольше max_wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            available = [state for state in self.keys if state.parked_until <= now]
+            if available:
+                # Больше всего запаса, при равенстве - дольше всех не использовался
+                state = max(available, key=lambda s: (s.headroom(), -s.last_used))
+            else:
+                # Все ключи исчерпаны - берем тот, что освободится раньше (его пейсер подождет),
+                # но только если ждать не дольше max_wait
+                state = min(self.keys, key=lambda s: s.parked_until)
+                if state.parked_until - now > self.max_wait:
+                    raise QuotaExhaustedError(state.parked_until - now)
+            state.in_flight += 1
+            state.last_used = now
+            return state
+
+    def release_key(self, state: ApiKeyState, headers: Mapping[str, str] | None) -> None:
+        """Учитывает ответ по ключу: обновляет квоту и паркует исчерпанный ключ"""
+        with self._lock:
+            state.in_flight = max(0, state.in_flight - 1)
+        if not headers:
+            return
+
+        state.pacer.update_from_headers(headers)
+        pacer = state.pacer
+        if pacer.remaining is not None and pacer.remaining - pacer.quota_reserve <= 0:
+            reset_at = pacer.reset_at if pacer.reset_at is not None else time.monotonic() + 60
+            state.parked_until = max(reset_at, time.monotonic() + 1)
+            logger.warning("Ключ %s исчерпан, запаркован на %.0f сек", state.label, state.parked_until - time.monotonic())
+
+    def on_rate_limited(self, state: ApiKeyState, headers: Mapping[str, str] | None) -> None:
+        """Ответ 429 по ключу: паркуем его на паузу пейсера (до сброса окна - только при исчерпанной квоте)"""
+        with self._lock:
+            state.in_flight = max(0, state.in_flight - 1)
+        wait = state.pacer.on_rate_limited(headers)
+        state.parked_until = time.monotonic() + wait
+
+    def report(self) -> str:
+        """Остаток квоты по ключам для отчета администратору"""
+        lines = []
+        for state in self.keys:
+            pacer = state.pacer
+            remaining = pacer.remaining if pacer.remaining is not None else "?"
+            limit = pacer.limit if pacer.limit is not None else "?"
+            parked = " (исчерпан)" if state.parked_until > time.monotonic() else ""
+            lines.append(f"{state.label}: {remaining}/{limit}{parked}")
+        return "\n".join(lines)
+
+
+_pools: Dict[Tuple[str, ...], KeyPool] = {}
+
+
+def get_key_pool(keys: List[str], max_rate: float, burst: float, quota_reserve: int = 0,
+                 low_water: int = 0, backoff: float = 2.0, max_wait: float = 300.0) -> KeyPool:
+    """Общий пул для набора ключей - все клиенты с теми же ключами делят квоту"""
+    pool_id = tuple(keys)
+    if pool_id not in _pools:
+        _pools[pool_id] = KeyPool(list(keys), max_rate, burst, quota_reserve, low_water, backoff, max_wait)
+    return _pools[pool_id]
@@ -0,0 +1,122 @@
+import re
+import unicodedata
+
+# Ссылки, упоминания и хэштеги не говорят о языке текста
+_NOISE_RE = re.compile(r'https?://\S+|www\.\S+|[@#]\w+')
+
+# Письменность языка: если текст не на письменности целевого языка, перевод нужен точно
+SCRIPTS = {
+    'ru': 'CYRILLIC',
+    'uk': 'CYRILLIC',
+    'be': 'CYRILLIC',
+    'bg': 'CYRILLIC',
+    'sr': 'CYRILLIC',
+    'en': 'LATIN',
+    'de': 'LATIN',
+    'fr': 'LATIN',
+    'es': 'LATIN',
+}
+
+# Приметы языков внутри одной письменности: характерные буквы и служебные слова.
+# Одна письменность еще не значит один язык (украинский и болгарский - тоже кириллица)
+LANGUAGE_LETTERS = {
+    'ru': 'ыэё',
+    'uk': 'іїєґ',
+    'be': 'іў',
+    'bg': '',
+    'sr': 'јљњћџђ',
+    'en': '',
+    'de': 'äöüß',
+    'fr': 'çàèêëîïôûùœ',
+    'es': 'ñáíóú¿¡',
+}
+# Буквы, которых в языке нет: хотя бы одна в тексте - язык не тот
+FOREIGN_LETTERS = {
+    'ru': 'іїєґўјљњћџђ',
+    'uk': 'ыэёўјљњћџђ',
+    'be': 'иїєґщъјљњћџђ',
+    'bg': 'ыэёіїєґўјљњћџђ',
+    'sr': 'ыэёіїєґўщъяюйь',
+    'en': 'äöüßñ¿¡œ',
+    'de': 'çàèêëîïôûùœñáíóú¿¡',
+    'fr': 'äößñáíóú¿¡',
+    'es': 'äößçàèêëîïôûùœ',
+}
+LANGUAGE_WORDS = {
+    'ru': frozenset({'что', 'это', 'как', 'так', 'его', 'только', 'был', 'была', 'если', 'уже'}),
+    'uk': frozenset({'що', 'це', 'як', 'та', 'його', 'який', 'яка', 'від', 'вже', 'бути'}),
+    'be': frozenset({'што', 'гэта', 'як', 'яго', 'які', 'ад', 'ужо', 'быць'}),
+    'bg': frozenset({'са', 'се', 'от', 'е', 'това', 'като', 'който', 'вече', 'ще', 'съм'}),
+    'sr': frozenset({'је', 'су', 'од', 'које', 'који', 'није'}),
+    'en': frozenset({'the', 'and', 'is', 'are', 'of', 'to', 'you', 'this', 'that', 'with', 'for', 'was'}),
+    'de': frozenset({'der', 'die', 'das', 'und', 'ist', 'nicht', 'ich', 'mit', 'ein', 'eine', 'auf', 'zu'}),
+    'fr': frozenset({'le', 'les', 'et', 'est', 'une', 'des', 'pas', 'pour', 'avec', 'dans', 'du', 'qui'}),
+    'es': frozenset({'el', 'los', 'las', 'y', 'por', 'para', 'con', 'una', 'del', 'pero', 'muy', 'que'}),
+}
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def script_share(text: str, script: str) -> tuple[int, float]:
+    """
+    Доля букв заданной письменности в тексте
+    :return: (число букв, доля букв письменности script)
+    """
+    letters = 0
+    matched = 0
+    for char in _NOISE_RE.sub(' ', text):
+        if not char.isalpha():
+            continue
+        letters += 1
+        # Имя символа вида 'CYRILLIC SMALL LETTER A' / 'LATIN CAPITAL LETTER B'
+        if unicodedata.name(char, '').startswith(script):
+            matched += 1
+    return letters, (matched / letters if letters else 0.0)
+
+
+def language_score(text: str, lang: str) -> int:
+    """Сколько примет языка lang в тексте (характерных букв и служебных слов)"""
+    letters = LANGUAGE_LETTERS.get(lang, '')
+    words = LANGUAGE_WORDS.get(lang, frozenset())
+    return sum(1 for char in text if char in letters) + sum(1 for word in _WORD_RE.findall(text) if word in words)
+
+
+def is_language(text: str, lang: str) -> bool:
+    """
+    Подтвержден ли язык lang среди языков той же письменности:
+    в тексте нет чужих для него букв, а его примет больше, чем примет любого другого языка
+    """
+    text = _NOISE_RE.sub(' ', text).lower()
+    if any(char in FOREIGN_LETTERS.get(lang, '') for char in text):
+        return False
+    score = language_score(text, lang)
+    if score == 0:
+        return False
+    return all(
+        language_score(text, other) < score
+        for other, script in SCRIPTS.items()
+        if script == SCRIPTS.get(lang) and other != lang
+    )
+
+
+def needs_translation(text: str | None, target_lang: str = 'ru', threshold: float = 0.6, min_letters: int = 2) -> bool:
+    """
+    Быстрая локальная проверка, нужен ли перевод
+    Не нужен для текста из одних ссылок, упоминаний, эмодзи и цифр,
+    а также если большая часть букв на письменности целевого языка и сам язык подтвержден
+    (см. is_language); не подтвержден - переводим
+    :param text: Текст поста
+    :param target_lang: Код целевого языка
+    :param threshold: Доля букв целевой письменности, начиная с которой текст может считаться уже переведенным
+    :param min_letters: Минимум букв, чтобы текст имело смысл переводить
+    """
+    if not text:
+        return False
+    script = SCRIPTS.get(target_lang)
+    letters, share = script_share(text, script or '')
+    if letters < min_letters:
+        return False
+    if script is None:
+        # Письменность целевого языка неизвестна - решать локально не беремся
+        return True
+    return share < threshold or not is_language(text, target_lang)
@@ -0,0 +1,38 @@
+import threading
+from collections import deque
+from typing import Deque, Dict
+
+
+class LatencyTracker:
+    """Скользящее окно длительностей запросов по ключу (например, по модели) с перцентилями"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def count(self, key: str) -> int:
+        return len(self._samples.get(key, ()))
+
+    def percentile(self, key: str, percent: float) -> float | None:
+        """Перцентиль (0-100) по последним замерам; None, если замеров нет"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, round(percent / 100 * len(samples)) - 1))
+        return samples[index]
+
+    def report(self) -> str:
+        lines = []
+        for key in sorted(self._samples):
+            p50, p95 = self.percentile(key, 50), self.percentile(key, 95)
+            lines.append(f"{key}: p50 {p50:.1f} сек, p95 {p95:.1f} сек ({self.count(key)} замеров)")
+        return "\n".join(lines)
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Dict, Iterable
+
+from services.http_session import get_session
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """
+    Кэш медиафайлов на диске с ограничением общего размера (вытесняются давно не использованные).
+    Файлы скачиваются заранее, пока идет перевод, и нужны, когда Telegram не может
+    сам забрать файл по URL - тогда он загружается с диска.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, directory: str, max_bytes: int, max_file_bytes: int, concurrency: int = 4):
+        """
+        :param directory: Каталог кэша
+        :param max_bytes: Максимальный суммарный размер файлов
+        :param max_file_bytes: Максимальный размер одного файла (лимит загрузки Telegram)
+        :param concurrency: Сколько файлов качать одновременно
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.concurrency = max(1, concurrency)
+        self._downloads: Dict[str, asyncio.Task] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def path_for(self, url: str) -> str:
+        name = hashlib.sha256(url.encode()).hexdigest()[:32]
+        ext = os.path.splitext(url.split('?', 1)[0])[1][:8]
+        return os.path.join(self.directory, name + ext)
+
+    def get(self, url: str) -> str | None:
+        """Путь к файлу, если он уже скачан (и отметка использования для LRU)"""
+        path = self.path_for(url)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def fetch(self, url: str) -> str | None:
+        """
+        Возвращает путь к файлу, при необходимости скачивая его
+        Одновременные запросы одного URL ждут одну загрузку
+        :return: None, если файл недоступен или больше max_file_bytes
+        """
+        path = self.get(url)
+        if path is not None:
+            return path
+
+        # shield: отмена ожидающего не прерывает общую загрузку
+        return await asyncio.shield(self._start_download(url))
+
+    def _start_download(self, url: str) -> asyncio.Task:
+        task = self._downloads.get(url)
+        if task is None:
+            task = asyncio.create_task(self._download(url))
+            self._downloads[url] = task
+            task.add_done_callback(lambda _: self._downloads.pop(url, None))
+        return task
+
+    async def _download(self, url: str) -> str | None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        path = self.path_for(url)
+        tmp_path = f"{path}.part"
+        os.makedirs(self.directory, exist_ok=True)
+        async with self._semaphore:
+            try:
+                session = await get_session()
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        logger.warning("Медиа %s недоступно: HTTP %s", url, response.status)
+                        return None
+                    if (response.content_length or 0) > self.max_file_bytes:
+                        logger.warning("Медиа %s больше лимита (%s байт)", url, response.content_length)
+                        return None
+
+                    size = 0
+                    with open(tmp_path, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                            size += len(chunk)
+                            if size > self.max_file_bytes:
+                                logger.warning("Медиа %s больше лимита, загрузка прервана", url)
+                                break
+                            f.write(chunk)
+                if size > self.max_file_bytes:
+                    os.remove(tmp_path)
+                    return None
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning("Не удалось скачать медиа %s: %s", url, e)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return None
+
+        self.evict()
+        return path
+
+    def prefetch(self, urls: Iterable[str]) -> None:
+        """Запускает фоновую загрузку файлов (не дожидаясь ее)"""
+        for url in urls:
+            if self.get(url) is None:
+                self._start_download(url)
+
+    def evict(self) -> int:
+        """Удаляет давно не использованные файлы, пока кэш больше max_bytes"""
+        try:
+            entries = [
+                entry for entry in os.scandir(self.directory)
+                if entry.is_file() and not entry.name.endswith('.part')
+            ]
+        except FileNotFoundError:
+            return 0
+
+        stats = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries]
+        total = sum(size for _, size, _ in stats)
+        removed = 0
+        for _, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            logger.info("Кэш медиа: удалено %s файлов, занято %.1f МБ", removed, total / 2 ** 20)
+        return removed
+
+
+media_cache = MediaCache(
+    directory=config.MEDIA_CACHE_DIR,
+    max_bytes=config.MEDIA_CACHE_MAX_MB * 2 ** 20,
+    max_file_bytes=config.MEDIA_MAX_FILE_MB * 2 ** 20,
+    concurrency=config.MEDIA_PREFETCH_CONCURRENCY
+)
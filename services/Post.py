@@ -0,0 +1,71 @@
+import json
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict
+
+
+@dataclass(frozen=True, slots=True)
+class Media:
+    """Медиа-вложение поста"""
+    type: str  # photo / video / animated_gif
+    url: str
+    media_key: str | None = None  # Идентификатор медиа в Twitter (для кэша выбора варианта видео)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'type': self.type, 'url': self.url, 'media_key': self.media_key}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Media":
+        return cls(type=data['type'], url=data['url'], media_key=data.get('media_key'))
+
+
+@dataclass(frozen=True, slots=True)
+class Post:
+    """
+    Неизменяемый пост из Twitter. Переведенный вариант - это дешевая копия
+    (with_translation), исходный объект не меняется.
+    """
+    id: str
+    text: str
+    created_at: int  # Unix-время (UTC)
+    quote: bool = False
+    retweeted: bool = False
+    pinned: bool = False
+    media: tuple[Media, ...] = field(default_factory=tuple)
+    original_text: str | None = None  # Заполняется после перевода
+
+    def with_translation(self, text: str) -> "Post":
+        """Возвращает копию поста с переводом, сохраняя оригинальный текст"""
+        return replace(self, text=text, original_text=self.text)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'text': self.text,
+            'created_at': self.created_at,
+            'quote': self.quote,
+            'retweeted': self.retweeted,
+            'pinned': self.pinned,
+            'media': [m.to_dict() for m in self.media],
+            'original_text': self.original_text
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Post":
+        return cls(
+            id=data['id'],
+            text=data['text'],
+            created_at=int(data['created_at']),
+            quote=data.get('quote', False),
+            retweeted=data.get('retweeted', False),
+            pinned=data.get('pinned', False),
+            media=tuple(Media.from_dict(m) for m in data.get('media', [])),
+            original_text=data.get('original_text')
+        )
+
+    def to_json(self) -> str:
+        """Сериализация для кэшей и очередей"""
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, payload: str) -> "Post":
+        return cls.from_dict(json.loads(payload))
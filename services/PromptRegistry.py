@@ -0,0 +1,88 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class _PromptEntry:
+    __slots__ = ('content', 'mtime', 'checked_at')
+
+    def __init__(self, content: str, mtime: float, checked_at: float):
+        self.content = content
+        self.mtime = mtime
+        self.checked_at = checked_at
+
+
+class PromptRegistry:
+    """
+    Реестр промптов: файлы читаются один раз и хранятся в памяти.
+    Файл перечитывается, только если изменилось его mtime (проверка не чаще check_interval),
+    поэтому промпты можно править на лету без чтения диска на каждый перевод.
+    """
+
+    def __init__(self, directory: str = "prompts", check_interval: float = 2.0):
+        """
+        :param directory: Каталог с промптами (<имя>.txt)
+        :param check_interval: Как часто (сек) проверять mtime файла
+        """
+        self.directory = directory
+        self.check_interval = check_interval
+        self._entries: Dict[str, _PromptEntry] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, name: str) -> str:
+        """Имя промпта ('translation_prompt') или путь к файлу -> путь к файлу"""
+        if os.sep in name or '/' in name or name.endswith('.txt'):
+            return name
+        return os.path.join(self.directory, f"{name}.txt")
+
+    def get(self, name: str) -> str:
+        """
+        Возвращает текст промпта по имени или пути
+        :raises FileNotFoundError: если файла нет и он не загружался ранее
+        """
+        path = self.resolve(name)
+        now = time.monotonic()
+        entry = self._entries.get(path)
+
+        if entry is not None and now - entry.checked_at < self.check_interval:
+            return entry.content
+
+        with self._lock:
+            entry = self._entries.get(path)
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                if entry is None:
+                    raise
+                # Файл временно пропал (например, при сохранении редактором) - оставляем старую версию
+                logger.warning("Промпт %s не найден, используется загруженная ранее версия", path)
+                entry.checked_at = now
+                return entry.content
+
+            if entry is None or mtime != entry.mtime:
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read().strip()
+                if entry is not None:
+                    logger.info("Промпт %s изменился, перезагружен", path)
+                entry = _PromptEntry(content, mtime, now)
+                self._entries[path] = entry
+            else:
+                entry.checked_at = now
+
+            return entry.content
+
+    def names(self) -> List[str]:
+        """Доступные промпты в каталоге"""
+        try:
+            return sorted(f[:-4] for f in os.listdir(self.directory) if f.endswith('.txt'))
+        except FileNotFoundError:
+            return []
+
+
+prompts = PromptRegistry(config.PROMPTS_DIR, config.PROMPT_RELOAD_INTERVAL)
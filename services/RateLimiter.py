@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Mapping
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием: каждый вызов сразу получает свое место в очереди
+    и время ожидания, поэтому запросы обслуживаются по порядку и не падают при нехватке токенов.
+    Потокобезопасен - одним экземпляром могут пользоваться синхронный и асинхронный код.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        :param rate: Скорость пополнения (токенов в секунду)
+        :param capacity: Максимальный запас токенов (размер всплеска)
+        """
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        # _updated может быть в будущем (пауза до сброса лимита) - тогда токены не копятся
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Резервирует токены и возвращает, сколько секунд нужно подождать перед запросом
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            delay = max(0.0, self._updated - now)
+            if self._tokens < 0:
+                delay += -self._tokens / self.rate
+            return delay
+
+    def set_rate(self, rate: float) -> None:
+        """Меняет скорость пополнения, учитывая уже накопленные токены"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(rate, 1e-6)
+
+    def pause(self, seconds: float) -> None:
+        """Запрещает выдачу токенов на указанное время (например, до сброса квоты)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, now + seconds)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Ожидает свободной емкости (асинхронно)"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, tokens: float = 1.0) -> None:
+        """Ожидает свободной емкости (блокирующе, для скриптов)"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class QuotaExhaustedError(Exception):
+    """Квота исчерпана, а до ее сброса дольше допустимого ожидания"""
+
+    def __init__(self, wait: float):
+        super().__init__(f"квота Twitter API исчерпана, сброс через {wait / 3600:.1f} ч")
+        self.wait = wait
+
+
+class RateLimitPacer(TokenBucket):
+    """
+    Пейсер запросов к RapidAPI: по заголовкам x-ratelimit-* узнает остаток квоты
+    и время до сброса окна. Пока квоты больше порога low_water, запросы идут на max_rate;
+    ниже порога скорость снижается пропорционально остатку, при исчерпании - пауза до сброса.
+    Окно квоты бывает суточным или месячным, поэтому остаток по нему не растягивается,
+    а если до сброса дольше max_wait, запрос не ждет, а сразу получает QuotaExhaustedError.
+    """
+
+    LIMIT_HEADER = "x-ratelimit-requests-limit"
+    REMAINING_HEADER = "x-ratelimit-requests-remaining"
+    RESET_HEADER = "x-ratelimit-requests-reset"
+
+    def __init__(self, max_rate: float, burst: float, quota_reserve: int = 0,
+                 low_water: int = 0, backoff: float = 2.0, max_wait: float = 300.0):
+        """
+        :param max_rate: Максимальная скорость запросов (в секунду), пока квоты достаточно
+        :param burst: Размер всплеска
+        :param quota_reserve: Сколько запросов квоты не расходовать (запас)
+        :param low_water: Остаток квоты, ниже которого запросы замедляются (не меньше burst)
+        :param backoff: Пауза после 429 без retry-after, если квота не исчерпана (секунды)
+        :param max_wait: Максимальное ожидание паузы перед запросом (секунды)
+        """
+        super().__init__(max_rate, burst)
+        self.max_rate = max_rate
+        self.quota_reserve = quota_reserve
+        self.low_water = max(low_water, burst)
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at: float | None = None
+
+    def blocked_for(self) -> float:
+        """Сколько секунд еще длится пауза (0 - паузы нет)"""
+        with self._lock:
+            return max(0.0, self._updated - time.monotonic())
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Как TokenBucket.reserve, но при паузе дольше max_wait - QuotaExhaustedError вместо ожидания"""
+        blocked = self.blocked_for()
+        if blocked > self.max_wait:
+            raise QuotaExhaustedError(blocked)
+        return super().reserve(tokens)
+
+    @staticmethod
+    def _header_number(headers: Mapping[str, str], name: str) -> float | None:
+        value = headers.get(name) if headers else None
+        try:
+            return float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Подстраивает скорость под остаток квоты из заголовков ответа"""
+        limit = self._header_number(headers, self.LIMIT_HEADER)
+        remaining = self._header_number(headers, self.REMAINING_HEADER)
+        reset = self._header_number(headers, self.RESET_HEADER)
+
+        if limit is not None:
+            self.limit = int(limit)
+        if remaining is None:
+            return
+        self.remaining = int(remaining)
+        if reset is not None:
+            self.reset_at = time.monotonic() + reset
+
+        usable = self.remaining - self.quota_reserve
+        if usable <= 0:
+            # Квота исчерпана - пауза до сброса окна (или минута, если время сброса неизвестно);
+            # если она дольше max_wait, запросы будут сразу отклоняться (см. reserve)
+            wait = max(reset, 1.0) if reset is not None else 60.0
+            logger.warning("Квота Twitter API исчерпана, пауза %.0f сек", wait)
+            self.pause(wait)
+            return
+
+        if usable < self.low_water:
+            # Квота на исходе - замедляемся пропорционально остатку
+            self.set_rate(self.max_rate * usable / self.low_water)
+        else:
+            self.set_rate(self.max_rate)
+
+    def on_rate_limited(self, headers: Mapping[str, str] | None = None) -> float:
+        """
+        Обрабатывает ответ 429: ставит пейсер на паузу
+        До сброса окна ждем, только если квота исчерпана (remaining = 0); иначе это
+        посекундный лимит - хватает короткой паузы
+        :return: Длительность паузы в секундах
+        """
+        retry_after = self._header_number(headers, "retry-after")
+        remaining = self._header_number(headers, self.REMAINING_HEADER)
+        reset = self._header_number(headers, self.RESET_HEADER)
+        if remaining is not None:
+            self.remaining = int(remaining)
+
+        if retry_after is not None:
+            wait = retry_after
+        elif remaining is not None and remaining - self.quota_reserve <= 0 and reset is not None:
+            wait = reset
+            self.reset_at = time.monotonic() + reset
+        else:
+            wait = self.backoff
+        wait = max(wait, 1.0)
+        logger.warning("Twitter API вернул 429, пауза %.1f сек", wait)
+        self.pause(wait)
+        return wait
@@ -1,31 +1,160 @@
+import asyncio
 import requests
+import aiohttp
 import json
-from typing import List, Dict, Any
+import logging
+import time
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 
 from datetime import datetime, timedelta
 
+from config import config
+from services.http_session import get_session
+from services.KeyPool import KeyPool, ApiKeyState, get_key_pool
+from services.RateLimiter import QuotaExhaustedError
+from services.Post import Post, Media
+from services.twitter_time import parse_twitter_time, to_epoch
+from services.CircuitBreaker import CircuitBreaker, backoff_delay
+from services.video_variants import video_probe
+
+logger = logging.getLogger(__name__)
+
+# Общая синхронная сессия (keep-alive) для скриптов вроде twitter_test.py
+_sync_session = requests.Session()
+_sync_session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+
+# Предохранители по эндпоинтам (user-tweets, user), общие для всех клиентов
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    if endpoint not in breakers:
+        breakers[endpoint] = CircuitBreaker(
+            name=endpoint,
+            failure_threshold=config.TWITTER_BREAKER_THRESHOLD,
+            recovery_timeout=config.TWITTER_BREAKER_RECOVERY
+        )
+    return breakers[endpoint]
+
+
+def is_transient_error(result: dict) -> bool:
+    """Временная ошибка, которую имеет смысл повторить: таймаут, обрыв связи, 5xx"""
+    if 'error' not in result:
+        return False
+    if result['error'] in ('Timeout Error', 'Connection Error'):
+        return True
+    return result.get('status', 0) >= 500
+
 
 class Twitter:
-    def __init__(self, api_host, api_key):
+    def __init__(self, api_host, api_key: str | List[str], scheme: str | None = None):
+        """
+        :param api_host: Хост RapidAPI
+        :param api_key: Ключ RapidAPI или список ключей (запросы распределяются по остатку квоты)
+        :param scheme: https или http (для локальной замены API - fake_twitter_api.py)
+        """
+        keys = [api_key] if isinstance(api_key, str) or api_key is None else list(api_key)
         self.API_HOST = api_host
-        self.API_KEY = api_key
+        self.API_KEY = keys[0] if keys else None
+        self.SCHEME = scheme or config.TWITTER_API_SCHEME
+        # Общий пул ключей с пейсером на каждый ключ (по заголовкам x-ratelimit-*)
+        self.key_pool: KeyPool = get_key_pool(
+            keys,
+            max_rate=config.TWITTER_MAX_RPS,
+            burst=config.TWITTER_BURST,
+            quota_reserve=config.TWITTER_QUOTA_RESERVE,
+            low_water=config.TWITTER_QUOTA_LOW_WATER,
+            backoff=config.TWITTER_RATE_LIMIT_BACKOFF,
+            max_wait=config.TWITTER_MAX_WAIT
+        )
+
+    def _request_headers(self, key_state: ApiKeyState | None = None) -> dict:
+        return {
+            "x-rapidapi-key": key_state.key if key_state else self.API_KEY,
+            "x-rapidapi-host": self.API_HOST
+        }
+
+    def _request_url(self, endpoint) -> str:
+        return f"{self.SCHEME}://{self.API_HOST}/{endpoint}"
+
+    def _circuit_open_error(self, endpoint) -> dict:
+        return {
+            'error': 'Circuit Open',
+            'message': f'эндпоинт {endpoint} временно недоступен, запрос не выполнялся',
+            'circuit_open': True
+        }
+
+    def _quota_exhausted_error(self, error: QuotaExhaustedError) -> dict:
+        return {'error': 'Quota Exhausted', 'message': str(error), 'status': 429}
+
+    def _after_attempt(self, breaker: CircuitBreaker, result: dict, attempt: int) -> float | None:
+        """
+        Учитывает результат попытки в предохранителе
+        :return: Задержка перед повтором или None, если повторять не нужно
+        """
+        if not is_transient_error(result):
+            # Успех или ошибка запроса (4xx) - эндпоинт жив
+            breaker.record_success()
+            return None
+
+        breaker.record_failure()
+        if attempt >= config.TWITTER_RETRIES or not breaker.allow():
+            return None
+
+        delay = backoff_delay(attempt, config.TWITTER_BACKOFF_BASE, config.TWITTER_BACKOFF_MAX)
+        logger.info("Twitter %s: %s, повтор через %.1f сек", breaker.name, result['error'], delay)
+        return delay
 
 # Общий метод для запроса к апи
     def _make_request(self, endpoint, params):
+        """Запрос с повторами временных ошибок и предохранителем эндпоинта"""
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            return self._circuit_open_error(endpoint)
+
+        attempt = 0
+        try:
+            while True:
+                result = self._request_once(endpoint, params)
+                delay = self._after_attempt(breaker, result, attempt)
+                if delay is None:
+                    return result
+                time.sleep(delay)
+                attempt += 1
+        except BaseException:
+            # Запрос прерван (отмена задачи, KeyboardInterrupt) - иначе half_open навсегда
+            # остался бы с занятым пробным слотом и отклонял все запросы
+            breaker.release_probe()
+            raise
+
+    def _request_once(self, endpoint, params):
         """Общий метод для выполнения запросов с обработкой ошибок"""
-        headers = {
-            "x-rapidapi-key": self.API_KEY,
-            "x-rapidapi-host": self.API_HOST
-        }
-        url = f"https://{self.API_HOST}/{endpoint}"
+        url = self._request_url(endpoint)
         
         try:
-            response = requests.get(
-                url,
-                headers=headers,
-                params=params,
-                timeout=10  # Таймаут для защиты от зависаний
-            )
+            for attempt in range(config.TWITTER_RATE_LIMIT_RETRIES + 1):
+                # Ключ с наибольшим остатком квоты; ждем его пейсер вместо того, чтобы упираться в 429
+                key_state = self.key_pool.acquire_key()
+                try:
+                    key_state.pacer.acquire_sync()
+                    response = _sync_session.get(
+                        url,
+                        headers=self._request_headers(key_state),
+                        params=params,
+                        # Таймаут для защиты от зависаний: (подключение, чтение)
+                        timeout=(config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+                    )
+                except BaseException:
+                    self.key_pool.release_key(key_state, None)
+                    raise
+
+                if response.status_code == 429 and attempt < config.TWITTER_RATE_LIMIT_RETRIES:
+                    # Ключ паркуется, следующая попытка уйдет на другой
+                    self.key_pool.on_rate_limited(key_state, response.headers)
+                    continue
+                self.key_pool.release_key(key_state, response.headers)
+                break
             
             # print(response.json())
             # print(params)
@@ -37,12 +166,20 @@ class Twitter:
 
             return {'response': response.json(), 'headers': response.headers}
         
+        except QuotaExhaustedError as errq:
+            # Ждать сброса квоты слишком долго - канал считается неудачным, прогон завершается
+            return self._quota_exhausted_error(errq)
+
         except requests.exceptions.HTTPError as errh:
             # Обработка HTTP ошибок (4xx, 5xx)
-            error_msg = response.json().get('message', 'Unknown HTTP error') if response.text else str(errh)
+            try:
+                error_msg = response.json().get('message', 'Unknown HTTP error') if response.text else str(errh)
+            except ValueError:
+                error_msg = response.text[:200]
             return {
                 'error': f'HTTP Error: {errh.response.status_code}',
-                'message': error_msg
+                'message': error_msg,
+                'status': errh.response.status_code
             }
             
         except requests.exceptions.ConnectionError as errc:
@@ -62,30 +199,82 @@ class Twitter:
             return {'error': 'JSON Decode Error', 'message': str(errv)}
 
 # Получить JSON из апи по твитам
-    def get_user_tweets(self, user: str, count: str, min_created_at_datetime=None, exclude_retweets=True) -> dict:
-        """Получение твитов пользователя по ID"""
-        data = self._make_request(
-            endpoint="user-tweets",
-            params={"user": user, "count": count}
-        )
-        
-        
-        if 'error' in data:
-            return {
-                "error": 'true',
-                "data": data['error'] + '  ' +data['message'],
-                # "rate_limit_limit": data['headers'].get("x-ratelimit-requests-limit"),
-                # "rate_limit_remaining": headers.get("x-ratelimit-requests-remaining")
-            }
-        
+    def get_user_tweets(self, user: str, count: str, min_created_at_datetime=None, exclude_retweets=True, max_pages: int = 1) -> dict:
+        """
+        Получение твитов пользователя по ID.
+        Если задан max_pages > 1, следует по курсору ленты, пока не дойдет до min_created_at_datetime
+        """
+        timeline = self._new_timeline()
+        cursor = None
+
+        for _ in range(max(1, max_pages)):
+            params = {"user": user, "count": count}
+            if cursor:
+                params["cursor"] = cursor
+            data = self._make_request(endpoint="user-tweets", params=params)
+
+            if 'error' in data:
+                if not timeline['pages']:
+                    return self._build_tweets_error(data)
+                break  # Отдаем то, что успели получить
+
+            cursor = self._add_timeline_page(timeline, data, min_created_at_datetime, exclude_retweets)
+            if not cursor:
+                break
+
+        return self._build_timeline_response(timeline)
+
+    def _build_tweets_error(self, data: dict) -> dict:
+        """Формирует ответ get_user_tweets с ошибкой из результата _make_request"""
+        return {
+            "error": 'true',
+            "data": data['error'] + '  ' +data['message'],
+            "circuit_open": data.get('circuit_open', False),
+            # "rate_limit_limit": data['headers'].get("x-ratelimit-requests-limit"),
+            # "rate_limit_remaining": headers.get("x-ratelimit-requests-remaining")
+        }
+
+    def _new_timeline(self) -> dict:
+        """Состояние постраничной загрузки ленты"""
+        return {'posts': [], 'ids': set(), 'headers': {}, 'pages': 0, 'cursor': None}
+
+    def _add_timeline_page(self, timeline: dict, data: dict, min_created_at_datetime=None, exclude_retweets=True) -> str | None:
+        """
+        Добавляет страницу ленты в состояние загрузки. Посты строятся лениво:
+        разбор останавливается на первом твите старше min_created_at_datetime, и более старые
+        твиты не превращаются в Post. Сам ответ уже декодирован целиком (json.loads в _request_once),
+        поэтому пиковую память на страницу это не снижает - экономится только построение постов
+        :return: Курсор следующей страницы или None, если дальше идти не нужно
+        """
+        timeline['pages'] += 1
+        timeline['headers'] = data['headers']
+
+        state = {'reached_min': False, 'regular': 0}
+        for post in self.__filter_posts(
+            self.__iter_posts(data['response']), min_created_at_datetime, exclude_retweets, state
+        ):
+            if post.id not in timeline['ids']:
+                timeline['ids'].add(post.id)
+                timeline['posts'].append(post)
+
+        # Дошли до уже обработанных постов или страница пустая (закрепленный твит не в счет)
+        if state['reached_min'] or not state['regular']:
+            timeline['cursor'] = None
         else:
-            
-            return {
-                "error": 'false',
-                "data": self.__extract_posts_from_twitter_json(data['response'], min_created_at_datetime, exclude_retweets),
-                "rate_limit_limit": data['headers'].get("x-ratelimit-requests-limit"),
-                "rate_limit_remaining": data['headers'].get("x-ratelimit-requests-remaining")
-            }
+            timeline['cursor'] = self.__get_bottom_cursor(data['response'])
+        return timeline['cursor']
+
+    def _build_timeline_response(self, timeline: dict) -> dict:
+        """Формирует ответ get_user_tweets из собранных страниц ленты"""
+        return {
+            "error": 'false',
+            "data": timeline['posts'],
+            "pages": timeline['pages'],
+            # Лимит страниц исчерпан, а до min_created_at_datetime не дошли
+            "truncated": timeline['cursor'] is not None,
+            "rate_limit_limit": timeline['headers'].get("x-ratelimit-requests-limit"),
+            "rate_limit_remaining": timeline['headers'].get("x-ratelimit-requests-remaining")
+        }
 
 # Получить JSON из апи по юзернейму
     def get_user_by_username(self, username: str) -> dict:
@@ -97,7 +286,10 @@ class Twitter:
             endpoint="user",
             params={"username": username}
         )
+        return self._build_user_response(data)
 
+    def _build_user_response(self, data: dict) -> dict:
+        """Формирует ответ get_user_by_username из результата _make_request"""
         # print(data)
         # print(headers)
         if 'error' in data:
@@ -107,123 +299,148 @@ class Twitter:
                 # "rate_limit_limit": headers.get("x-ratelimit-requests-limit"),
                 # "rate_limit_remaining": headers.get("x-ratelimit-requests-remaining")
             }
+        try:
+            rest_id = self.__get_user_rest_id(data['response'])
+        except (KeyError, TypeError):
+            # Ответ без пользователя - аккаунт не существует
+            return {
+                "error": 'true',
+                "data": 'User not found',
+                "not_found": True
+            }
         else:   
             return {
                 "error": 'false',
-                "data": self.__get_user_rest_id(data['response']),                
+                "data": rest_id,                
                 "rate_limit_limit": data['headers'].get("x-ratelimit-requests-limit"),
                 "rate_limit_remaining": data['headers'].get("x-ratelimit-requests-remaining")
             }
 
-    def extract(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def extract(self, data: Dict[str, Any]) -> List[Post]:
         """
         Извлекает список постов с медиа-вложениями из JSON-ответа Twitter.
-        Возвращает список словарей с информацией о каждом посте.
+        Возвращает список объектов Post.
         """
         return self.__extract_posts_from_twitter_json(data)
 
+    def __get_bottom_cursor(self, data: Dict[str, Any]) -> str | None:
+        """Ищет курсор следующей (более старой) страницы ленты"""
+        cursor = data.get('cursor', {})
+        if isinstance(cursor, dict) and cursor.get('bottom'):
+            return cursor['bottom']
+
+        timeline_instructions = data.get('result', {}).get('timeline', {}).get('instructions', [])
+        for instruction in timeline_instructions:
+            if instruction.get('type') != 'TimelineAddEntries':
+                continue
+            for entry in instruction.get('entries', []):
+                if entry.get('entryId', '').startswith('cursor-bottom'):
+                    return entry.get('content', {}).get('value')
+        return None
+
     def __filter_posts(
         self, 
-        posts: List[Dict[str, Any]], 
-        min_created_at_datetime: datetime | None = None,
-        exclude_retweets: bool = True
-    ) -> List[Dict[str, Any]]:
+        posts: Iterable[Post], 
+        min_created_at_datetime: datetime | int | None = None,
+        exclude_retweets: bool = True,
+        state: dict | None = None
+    ) -> Iterator[Post]:
         """
-        Фильтрует список постов:
+        Фильтрует поток постов за один проход:
         - Исключает ретвиты (если exclude_retweets=True)
-        - Оставляет только посты после указанной даты (если min_created_at задан)
+        - Оставляет только посты не старше указанной даты (если min_created_at задан).
+          Лента идет от новых к старым, поэтому на первом более старом посте
+          (кроме закрепленного) фильтр останавливается и дальше не читает
+        :param state: Необязательный словарь: reached_min - дошли ли до min_created_at,
+                      regular - сколько незакрепленных твитов просмотрено
         """
-        filtered = posts
-        
-        min_created_at = self.__datetime_to_filter_format(min_created_at_datetime) if min_created_at_datetime else None
-        
-        # Фильтрация ретвитов
-        if exclude_retweets:
-            filtered = [post for post in filtered if not post['retweeted']]
-        
-        # Фильтрация по времени
-        if min_created_at:
-            filtered = [post for post in filtered if post['created_at'] > min_created_at]
-        
-        return filtered
+        state = state if state is not None else {}
+        state.setdefault('reached_min', False)
+        state.setdefault('regular', 0)
+
+        # Сравниваем числа (unix-время), а не строки/datetime
+        min_created_at = to_epoch(min_created_at_datetime) if min_created_at_datetime else None
+
+        for post in posts:
+            if not post.pinned:
+                state['regular'] += 1
+
+            # Фильтрация по времени
+            # Твиты с тем же временем, что и min_created_at, пропускаем дальше -
+            # повторы отсекает индекс доставленных твитов по rest_id
+            if min_created_at and post.created_at < min_created_at:
+                if post.pinned:
+                    continue
+                state['reached_min'] = True
+                return
+
+            # Фильтрация ретвитов
+            if exclude_retweets and post.retweeted:
+                continue
+
+            yield post
 
 
-    def __datetime_to_filter_format(self, dt: datetime) -> str:
-        """Преобразует datetime в строку формата ГГГГ-ММ-ДД-ЧЧ-ММ-СС"""
-        return dt.strftime('%Y-%m-%d-%H-%M-%S')
     
 # Распарсить JSON с твитами
-    def __extract_posts_from_twitter_json(self, data: Dict[str, Any], min_created_at_datetime=None, exclude_retweets=True) -> List[Dict[str, Any]]:
+    def __extract_posts_from_twitter_json(self, data: Dict[str, Any], min_created_at_datetime=None, exclude_retweets=True) -> List[Post]:
         """
         Извлекает только видимые посты (исключая ретвиты, цитаты и скрытые элементы) 
         со всеми вложениями из JSON Twitter
         """
-        visible_posts = []
-        
+        return list(self.__filter_posts(self.__iter_posts(data), min_created_at_datetime, exclude_retweets))
+
+    def __iter_timeline_tweets(self, data: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], bool]]:
+        """
+        Лениво обходит инструкции ленты и отдает пары (tweet result, закреплен ли)
+        """
         # Ищем основную временную шкалу
         timeline_instructions = data.get('result', {}).get('timeline', {}).get('instructions', [])
         
         for instruction in timeline_instructions:
             # Обрабатываем основные записи ленты
             if instruction['type'] == 'TimelineAddEntries':
-                entries = instruction.get('entries', [])
-                for entry in entries:
+                for entry in instruction.get('entries', []):
                     entry_id = entry.get('entryId', '')
                     
                     # Фильтруем только видимые посты
                     if not entry_id.startswith(('tweet-', 'profile-conversation')):
                         continue
                         
-                    content = entry.get('content', {})
-                    item_content = content.get('itemContent', {})
+                    item_content = entry.get('content', {}).get('itemContent', {})
                     
                     # Обрабатываем только основные твиты
                     if item_content.get('itemType') == 'TimelineTweet':
-                        tweet_results = item_content.get('tweet_results', {})
-                        tweet = tweet_results.get('result', {})
-                        self.__process_tweet(tweet, visible_posts)
+                        yield item_content.get('tweet_results', {}).get('result', {}), False
             
             # Обрабатываем закрепленный твит
             elif instruction['type'] == 'TimelinePinEntry':
-                entry = instruction.get('entry', {})
-                content = entry.get('content', {})
-                item_content = content.get('itemContent', {})
+                item_content = instruction.get('entry', {}).get('content', {}).get('itemContent', {})
                 
                 if item_content.get('itemType') == 'TimelineTweet':
-                    tweet_results = item_content.get('tweet_results', {})
-                    tweet = tweet_results.get('result', {})
-                    self.__process_tweet(tweet, visible_posts)
-        
-        # print(visible_posts)
-        filtered_posts = self.__filter_posts(visible_posts, min_created_at_datetime, exclude_retweets)
-        # print(filtered_posts)
-        return filtered_posts
+                    yield item_content.get('tweet_results', {}).get('result', {}), True
+
+    def __iter_posts(self, data: Dict[str, Any]) -> Iterator[Post]:
+        """Лениво превращает твиты ленты в посты - ничего не разбирается заранее"""
+        for tweet, pinned in self.__iter_timeline_tweets(data):
+            post = self.__process_tweet(tweet, pinned)
+            if post is not None:
+                yield post
 
     
-    def __parse_twitter_time(self, time_str):
-        # Парсим строку с помощью datetime
-        dt = datetime.strptime(time_str, '%a %b %d %H:%M:%S %z %Y')
-        
-        # Форматируем в строку чисел: ГодМесяцДеньЧасМинутаСекунда
-        return dt.strftime('%Y-%m-%d-%H-%M-%S')
+    def __parse_twitter_time(self, time_str) -> int:
+        # Быстрый разбор фиксированного формата Twitter в unix-время
+        return parse_twitter_time(time_str)
     
-    def __process_tweet(self, tweet: Dict[str, Any], posts_list: List[Dict[str, Any]]) -> None:
-        """Обрабатывает твит и добавляет его в список постов"""
+    def __process_tweet(self, tweet: Dict[str, Any], pinned: bool = False) -> Post | None:
+        """Обрабатывает твит и возвращает пост (None, если это не твит)"""
         if tweet.get('__typename') != 'Tweet':
-            return
+            return None
         
         legacy = tweet.get('legacy', {})
         text = legacy.get('full_text', '')
         
-        # Основные данные твита
-        tweet_data = {
-            'id': tweet.get('rest_id', ''),
-            'text': text,
-            'quote': legacy.get('is_quote_status'),
-            'retweeted': text.startswith('RT'),
-            'created_at': self.__parse_twitter_time(legacy.get('created_at', '')),
-            'media': []
-        }
+        media = []
         
         # Извлекаем медиа-вложения
         entities = legacy.get('extended_entities', legacy.get('entities', {}))
@@ -231,6 +448,7 @@ class Twitter:
         if entities and 'media' in entities:
             for media_item in entities['media']:
                 media_type = media_item.get('type', '')
+                media_key = media_item.get('media_key') or None
                 media_url = ''
                 
                 # Для видео и GIF обрабатываем отдельно
@@ -238,21 +456,19 @@ class Twitter:
                     # Вариант 1: Прямая ссылка на видео в поле 'media_url_https'
                     media_url = media_item.get('media_url_https', '')
                     
-                    # Вариант 2: Ссылка на видео в вариантах
-                    variants = media_item.get('video_info', {}).get('variants', [])
+                    # Вариант 2: Ссылка на видео в вариантах - лучший по битрейту, который
+                    # по оценке размера (битрейт * длительность) влезает в лимит Telegram
+                    video_info = media_item.get('video_info', {})
+                    variants = video_info.get('variants', [])
                     if variants:
-                        # Ищем вариант с самым высоким битрейтом
-                        variants.sort(key=lambda x: x.get('bitrate', 0), reverse=True)
-                        best_variant = variants[0]
+                        url = video_probe.choose(media_key, variants, video_info.get('duration_millis')) or ''
                         
                         # Проверяем, является ли ссылка полной
-                        url = best_variant.get('url', '')
-                        if url.startswith('https://'):
+                        if url.startswith(('https://', 'http://')):
                             media_url = url
                     
                     # Вариант 3: Ссылка на amplify_video (специфичный формат Twitter)
                     if not media_url:
-                        media_key = media_item.get('media_key', '')
                         if media_key:
                             media_url = f"https://video.twimg.com/amplify_video/{media_key}/vid/avc1/1080x1920/video.mp4"
                 
@@ -261,16 +477,146 @@ class Twitter:
                     media_url = media_item.get('media_url_https', '')
                 
                 if media_url:
-                    tweet_data['media'].append({
-                        'type': media_type,
-                        'url': media_url
-                    })
+                    media.append(Media(type=media_type, url=media_url, media_key=media_key))
         
-        # Добавляем твит в результаты
-        posts_list.append(tweet_data)
+        # Основные данные твита
+        return Post(
+            id=tweet.get('rest_id', ''),
+            text=text,
+            created_at=self.__parse_twitter_time(legacy.get('created_at', '')),
+            quote=bool(legacy.get('is_quote_status')),
+            retweeted=text.startswith('RT'),
+            pinned=pinned,
+            media=tuple(media)
+        )
         
     
 # Распарсить JSON с user_id
     def __get_user_rest_id(self, data: Dict[str, Any]) -> str:
         # print(data)
         return data['result']['data']['user']['result']['rest_id']
+
+
+class AsyncTwitter(Twitter):
+    """
+    Асинхронный клиент Twitter API для работы внутри event loop бота.
+    Все экземпляры используют одну общую сессию с пулом keep-alive соединений.
+    """
+
+    async def _make_request(self, endpoint, params):
+        """Запрос с повторами временных ошибок и предохранителем эндпоинта"""
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            return self._circuit_open_error(endpoint)
+
+        attempt = 0
+        try:
+            while True:
+                result = await self._request_once(endpoint, params)
+                delay = self._after_attempt(breaker, result, attempt)
+                if delay is None:
+                    return result
+                await asyncio.sleep(delay)
+                attempt += 1
+        except BaseException:
+            # Запрос прерван (отмена задачи, KeyboardInterrupt) - иначе half_open навсегда
+            # остался бы с занятым пробным слотом и отклонял все запросы
+            breaker.release_probe()
+            raise
+
+    async def _request_once(self, endpoint, params):
+        """Асинхронный вариант _request_once с тем же форматом результата"""
+        session = await get_session()
+
+        try:
+            for attempt in range(config.TWITTER_RATE_LIMIT_RETRIES + 1):
+                # Ключ с наибольшим остатком квоты; ждем его пейсер вместо того, чтобы упираться в 429
+                key_state = self.key_pool.acquire_key()
+                try:
+                    await key_state.pacer.acquire()
+                    async with session.get(
+                        self._request_url(endpoint),
+                        headers=self._request_headers(key_state),
+                        params=params
+                    ) as response:
+                        body = await response.text()
+                        status = response.status
+                        reason = response.reason
+                        response_headers = response.headers
+                except BaseException:
+                    self.key_pool.release_key(key_state, None)
+                    raise
+
+                if status == 429 and attempt < config.TWITTER_RATE_LIMIT_RETRIES:
+                    # Ключ паркуется, следующая попытка уйдет на другой
+                    self.key_pool.on_rate_limited(key_state, response_headers)
+                    continue
+                self.key_pool.release_key(key_state, response_headers)
+                break
+
+            if status >= 400:
+                # Обработка HTTP ошибок (4xx, 5xx)
+                try:
+                    error_msg = json.loads(body).get('message', 'Unknown HTTP error') if body else reason
+                except ValueError:
+                    error_msg = body[:200]
+                return {
+                    'error': f'HTTP Error: {status}',
+                    'message': error_msg,
+                    'status': status
+                }
+
+            return {'response': json.loads(body), 'headers': response_headers}
+
+        except QuotaExhaustedError as errq:
+            # Ждать сброса квоты слишком долго - канал считается неудачным, прогон завершается
+            return self._quota_exhausted_error(errq)
+
+        except asyncio.TimeoutError as errt:
+            # Таймаут запроса
+            return {'error': 'Timeout Error', 'message': str(errt) or 'Request timed out'}
+
+        except aiohttp.ClientConnectionError as errc:
+            # Проблемы с подключением
+            return {'error': 'Connection Error', 'message': str(errc)}
+
+        except aiohttp.ClientError as err:
+            # Общие ошибки запросов
+            return {'error': 'Request Failed', 'message': str(err)}
+
+        except ValueError as errv:
+            # Ошибки декодирования JSON
+            return {'error': 'JSON Decode Error', 'message': str(errv)}
+
+    async def get_user_tweets(self, user: str, count: str, min_created_at_datetime=None, exclude_retweets=True, max_pages: int = 1) -> dict:
+        """Получение твитов пользователя по ID (с переходом по курсору, см. Twitter.get_user_tweets)"""
+        timeline = self._new_timeline()
+        cursor = None
+
+        for _ in range(max(1, max_pages)):
+            params = {"user": user, "count": count}
+            if cursor:
+                params["cursor"] = cursor
+            data = await self._make_request(endpoint="user-tweets", params=params)
+
+            if 'error' in data:
+                if not timeline['pages']:
+                    return self._build_tweets_error(data)
+                break  # Отдаем то, что успели получить
+
+            cursor = self._add_timeline_page(timeline, data, min_created_at_datetime, exclude_retweets)
+            if not cursor:
+                break
+
+        return self._build_timeline_response(timeline)
+
+    async def get_user_by_username(self, username: str) -> dict:
+        """Получение данных пользователя по имени"""
+        if username.startswith('@'):
+            username = username[1:]
+
+        data = await self._make_request(
+            endpoint="user",
+            params={"username": username}
+        )
+        return self._build_user_response(data)
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+
+import aiohttp
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+_session: aiohttp.ClientSession | None = None
+_session_lock = asyncio.Lock()
+
+
+def build_timeout() -> aiohttp.ClientTimeout:
+    """Таймауты подключения/чтения из конфигурации"""
+    return aiohttp.ClientTimeout(
+        total=None,
+        sock_connect=config.HTTP_CONNECT_TIMEOUT,
+        sock_read=config.HTTP_READ_TIMEOUT
+    )
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Возвращает общую HTTP-сессию с пулом keep-alive соединений.
+    Сессия создается лениво внутри работающего event loop.
+    """
+    global _session
+
+    if _session is not None and not _session.closed:
+        return _session
+
+    async with _session_lock:
+        if _session is None or _session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=config.HTTP_POOL_SIZE,
+                limit_per_host=config.HTTP_POOL_SIZE,
+                keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300
+            )
+            _session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=build_timeout(),
+                headers={"Accept-Encoding": "gzip, deflate"},
+                auto_decompress=True
+            )
+            logger.info("Создана общая HTTP-сессия (пул: %s)", config.HTTP_POOL_SIZE)
+
+    return _session
+
+
+async def close_session() -> None:
+    """Закрывает общую HTTP-сессию (при остановке бота)"""
+    global _session
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+# Быстрый разбор времени твитов без strptime.
+# Формат created_at у Twitter фиксированный: 'Wed Oct 10 20:19:24 +0000 2018'
+
+_MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+
+def _days_from_civil(year: int, month: int, day: int) -> int:
+    """Количество дней от 1970-01-01 до даты (алгоритм Howard Hinnant)"""
+    year -= month <= 2
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def parse_twitter_time(value: str) -> int:
+    """
+    Преобразует created_at Twitter в unix-время (секунды, UTC)
+    :raises ValueError: если строка не в формате Twitter
+    """
+    try:
+        # 'Wed Oct 10 20:19:24 +0000 2018'
+        #  0   4   8  11 14 17 20    26
+        month = _MONTHS[value[4:7]]
+        day = int(value[8:10])
+        hour = int(value[11:13])
+        minute = int(value[14:16])
+        second = int(value[17:19])
+        sign = -1 if value[20] == '-' else 1
+        offset = sign * (int(value[21:23]) * 3600 + int(value[23:25]) * 60)
+        year = int(value[26:30])
+    except (KeyError, IndexError, ValueError):
+        raise ValueError(f"Некорректное время Twitter: {value!r}") from None
+
+    return _days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second - offset
+
+
+def parse_post_time(value: str | None) -> int | None:
+    """Преобразует Channel.last_post_time (ГГГГ-ММ-ДД-ЧЧ-ММ-СС, UTC) в unix-время"""
+    if not value:
+        return None
+    try:
+        year, month, day, hour, minute, second = (int(part) for part in value.split('-'))
+    except ValueError:
+        return None
+    return _days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second
+
+
+def format_post_time(epoch: int) -> str:
+    """Преобразует unix-время в формат Channel.last_post_time (ГГГГ-ММ-ДД-ЧЧ-ММ-СС, UTC)"""
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime('%Y-%m-%d-%H-%M-%S')
+
+
+def to_epoch(value: datetime | int | float) -> int:
+    """Приводит datetime (наивный - считаем UTC) или число к unix-времени"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
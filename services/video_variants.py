@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from dataclasses import replace
+from typing import Any, Dict, List, Sequence
+
+from services.http_session import get_session
+from services.LRUCache import LRUCache
+from services.Post import Media, Post
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Запас на контейнер и аудиодорожку сверх видеобитрейта
+SIZE_OVERHEAD = 1.1
+
+
+def mp4_variants(variants: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """MP4-варианты по убыванию битрейта (исходный список не меняется; HLS-плейлисты отбрасываются)"""
+    mp4 = [v for v in variants if v.get('content_type', 'video/mp4') == 'video/mp4' and v.get('url')]
+    return sorted(mp4, key=lambda v: v.get('bitrate', 0), reverse=True)
+
+
+def estimate_size(variant: Dict[str, Any], duration_millis: int | None) -> int | None:
+    """Оценка размера файла в байтах: битрейт * длительность / 8; None - оценить нельзя"""
+    bitrate = variant.get('bitrate')
+    if not bitrate or not duration_millis:
+        return None
+    return int(bitrate * duration_millis / 1000 / 8 * SIZE_OVERHEAD)
+
+
+def select_variant(candidates: Sequence[Dict[str, Any]], duration_millis: int | None, max_bytes: int) -> Dict[str, Any] | None:
+    """
+    Лучший вариант, который по оценке влезает в лимит Telegram
+    :param candidates: Варианты по убыванию битрейта (mp4_variants)
+    :return: Вариант; если не влезает ни один - самый легкий; None - вариантов нет
+    """
+    for variant in candidates:
+        size = estimate_size(variant, duration_millis)
+        if size is None or size <= max_bytes:
+            return variant
+    return candidates[-1] if candidates else None
+
+
+class VideoProbe:
+    """
+    Кэш выбора варианта видео по media_key.
+    При разборе твита вариант выбирается по оценке размера; probe_posts уточняет выбор
+    по реальному Content-Length (HEAD) и запоминает его - следующие запуски берут готовый URL
+    """
+
+    def __init__(self, max_bytes: int, cache_size: int, ttl: float | None = None):
+        self.max_bytes = max_bytes
+        # media_key -> URL проверенного варианта
+        self.chosen_urls = LRUCache(maxsize=cache_size, ttl=ttl)
+        # media_key -> URL вариантов по убыванию битрейта (для проверки)
+        self.candidates = LRUCache(maxsize=cache_size, ttl=ttl)
+
+    def chosen(self, media_key: str | None) -> str | None:
+        return self.chosen_urls.get(media_key) if media_key else None
+
+    def choose(self, media_key: str | None, variants: Sequence[Dict[str, Any]], duration_millis: int | None) -> str | None:
+        """URL варианта для отправки: из кэша проверок или по оценке размера"""
+        url = self.chosen(media_key)
+        if url:
+            return url
+
+        candidates = mp4_variants(variants)
+        if media_key and candidates:
+            self.candidates.set(media_key, tuple(v['url'] for v in candidates))
+        variant = select_variant(candidates, duration_millis, self.max_bytes)
+        return variant['url'] if variant else None
+
+    async def _content_length(self, url: str) -> int | None:
+        try:
+            session = await get_session()
+            async with session.head(url, allow_redirects=True) as response:
+                if response.status != 200:
+                    return None
+                return response.content_length
+        except Exception as e:
+            logger.warning("Не удалось проверить размер %s: %s", url, e)
+            return None
+
+    async def probe(self, media: Media) -> Media:
+        """Проверяет размер выбранного варианта; если он не влезает - берет следующий по битрейту"""
+        if media.type != 'video' or not media.media_key:
+            return media
+        url = self.chosen(media.media_key)
+        if url:
+            return replace(media, url=url)
+
+        candidates = self.candidates.get(media.media_key) or (media.url,)
+        # Начинаем с выбранного по оценке - более тяжелые варианты уже отсеяны
+        start = candidates.index(media.url) if media.url in candidates else 0
+        for url in candidates[start:]:
+            size = await self._content_length(url)
+            if size is None:
+                # Размер неизвестен - оставляем выбор по оценке, в кэш не пишем
+                return media
+            if size <= self.max_bytes:
+                self.chosen_urls.set(media.media_key, url)
+                if url != media.url:
+                    logger.info("Видео %s: выбран вариант %s (%.1f МБ)", media.media_key, url, size / 2 ** 20)
+                return replace(media, url=url)
+
+        # Ни один вариант не влезает в лимит по URL - самый легкий (его еще можно загрузить файлом)
+        self.chosen_urls.set(media.media_key, candidates[-1])
+        return replace(media, url=candidates[-1])
+
+    async def probe_posts(self, posts: List[Post]) -> List[Post]:
+        """Уточняет варианты видео во всех постах (проверки идут параллельно)"""
+        async def probe_post(post: Post) -> Post:
+            if not any(m.type == 'video' and m.media_key for m in post.media):
+                return post
+            media = await asyncio.gather(*(self.probe(m) for m in post.media))
+            return replace(post, media=tuple(media))
+
+        return list(await asyncio.gather(*(probe_post(post) for post in posts)))
+
+
+video_probe = VideoProbe(
+    max_bytes=config.TELEGRAM_VIDEO_MAX_MB * 2 ** 20,
+    cache_size=config.VIDEO_PROBE_CACHE_SIZE,
+    ttl=config.VIDEO_PROBE_CACHE_TTL_HOURS * 3600
+)
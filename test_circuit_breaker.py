@@ -0,0 +1,34 @@
+import asyncio
+
+from services.CircuitBreaker import CircuitBreaker
+from services.Twitter import AsyncTwitter, breakers
+
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_cancelled_probe_releases_half_open_slot(monkeypatch):
+    breaker = CircuitBreaker('user', failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    monkeypatch.setitem(breakers, 'user', breaker)
+
+    async def hanging_request(endpoint, params):
+        await asyncio.sleep(10)
+
+    async def main():
+        client = AsyncTwitter('127.0.0.1:1', ['test-breaker-key'], scheme='http')
+        monkeypatch.setattr(client, '_request_once', hanging_request)
+        probe = asyncio.create_task(client._make_request('user', {}))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+    asyncio.run(main())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
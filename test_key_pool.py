@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from services.KeyPool import KeyPool
+from services.RateLimiter import QuotaExhaustedError, RateLimitPacer
+
+
+def _headers(remaining, reset=3600):
+    return {
+        RateLimitPacer.LIMIT_HEADER: '1000',
+        RateLimitPacer.REMAINING_HEADER: str(remaining),
+        RateLimitPacer.RESET_HEADER: str(reset),
+    }
+
+
+def _pool(*keys, max_wait=300):
+    return KeyPool(list(keys), max_rate=100, burst=5, low_water=5, max_wait=max_wait)
+
+
+def test_picks_key_with_most_remaining_quota():
+    pool = _pool('a', 'b')
+    pool.release_key(pool.acquire_key(), _headers(remaining=10))
+    pool.release_key(pool.acquire_key(), _headers(remaining=500))
+    assert pool.acquire_key().key == 'b'
+
+
+def test_unknown_keys_are_tried_before_known_ones():
+    pool = _pool('a', 'b')
+    first = pool.acquire_key()
+    pool.release_key(first, _headers(remaining=500))
+    assert pool.acquire_key().key != first.key
+
+
+def test_exhausted_key_is_parked():
+    pool = _pool('a', 'b')
+    state = next(s for s in pool.keys if s.key == 'a')
+    state.in_flight += 1
+    pool.release_key(state, _headers(remaining=0, reset=60))
+    assert state.parked_until > time.monotonic() + 50
+    assert all(pool.acquire_key().key == 'b' for _ in range(3))
+
+
+def test_all_keys_parked_past_max_wait_fail_fast():
+    pool = _pool('a', 'b', max_wait=300)
+    for state in pool.keys:
+        state.in_flight += 1
+        pool.release_key(state, _headers(remaining=0, reset=86400))
+    with pytest.raises(QuotaExhaustedError):
+        pool.acquire_key()
+
+
+def test_all_keys_parked_briefly_returns_the_earliest():
+    pool = _pool('a', 'b', max_wait=300)
+    for state, reset in zip(pool.keys, (120, 30)):
+        state.in_flight += 1
+        pool.release_key(state, _headers(remaining=0, reset=reset))
+    assert pool.acquire_key().key == 'b'
+
+
+def test_per_second_rate_limit_parks_key_briefly():
+    pool = _pool('a')
+    state = pool.acquire_key()
+    pool.on_rate_limited(state, _headers(remaining=200, reset=86400))
+    assert state.parked_until - time.monotonic() <= 2
+    assert state.in_flight == 0
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import time
+
+from aiohttp import web
+from aiogram.types import FSInputFile
+
+from app.handlers import utils_sendplan
+from fake_twitter_api import FakeTwitterApi, parse_args
+from services.http_session import close_session
+from services.MediaCache import MediaCache
+from services.Post import Media
+
+
+# Медиафайлы отдает fake_twitter_api.py на локальном порту: python -m pytest test_media_cache.py
+MEDIA_SIZE_KB = 4
+
+
+async def _serve(api: FakeTwitterApi) -> tuple[web.AppRunner, str]:
+    runner = web.AppRunner(api.build_app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}/media/pbs.twimg.com/media"
+
+
+def _run(scenario):
+    """Поднимает фейковый API, выполняет сценарий и закрывает общую HTTP-сессию"""
+    async def main():
+        api = FakeTwitterApi(parse_args(['--media-size', str(MEDIA_SIZE_KB)]))
+        runner, base = await _serve(api)
+        try:
+            await scenario(api, base)
+        finally:
+            await close_session()
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_fetch_caches_file(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=2 ** 20, max_file_bytes=2 ** 20)
+
+    async def scenario(api, base):
+        url = f"{base}/one.jpg"
+        path = await cache.fetch(url)
+        assert path is not None and os.path.getsize(path) == MEDIA_SIZE_KB * 1024
+        # Повторный запрос берется с диска, без скачивания
+        assert await cache.fetch(url) == path
+        assert api.stats['media'] == 1
+
+    _run(scenario)
+
+
+def test_file_size_cap(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=2 ** 20, max_file_bytes=MEDIA_SIZE_KB * 1024 // 2)
+
+    async def scenario(api, base):
+        assert await cache.fetch(f"{base}/big.jpg") is None
+        assert os.listdir(tmp_path) == []
+
+    _run(scenario)
+
+
+def test_lru_eviction(tmp_path):
+    # Помещается два файла из трех
+    cache = MediaCache(str(tmp_path), max_bytes=int(MEDIA_SIZE_KB * 1024 * 2.5), max_file_bytes=2 ** 20)
+
+    async def scenario(api, base):
+        first, second, third = (f"{base}/{name}.jpg" for name in ('first', 'second', 'third'))
+        await cache.fetch(first)
+        await cache.fetch(second)
+        # Оба файла давно не использовались, затем первый снова понадобился
+        past = time.time() - 100
+        for url in (first, second):
+            os.utime(cache.path_for(url), (past, past))
+        assert cache.get(first) is not None
+
+        await cache.fetch(third)
+        assert cache.get(first) is not None
+        assert cache.get(second) is None
+        assert cache.get(third) is not None
+
+    _run(scenario)
+
+
+class _UrlRejectingBot:
+    """Бот, которому Telegram "не смог" скачать файл по URL - принимается только загрузка с диска"""
+
+    def __init__(self):
+        self.uploads = []
+        self.messages = []
+
+    async def send_photo(self, chat_id, photo, caption=None):
+        if not isinstance(photo, FSInputFile):
+            raise RuntimeError("failed to get HTTP URL content")
+        self.uploads.append((chat_id, photo.path, caption))
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+def test_send_single_falls_back_to_upload(tmp_path, monkeypatch):
+    cache = MediaCache(str(tmp_path), max_bytes=2 ** 20, max_file_bytes=2 ** 20)
+    monkeypatch.setattr(utils_sendplan, 'media_cache', cache)
+    bot = _UrlRejectingBot()
+
+    async def scenario(api, base):
+        url = f"{base}/upload.jpg"
+        await utils_sendplan._send_single(bot, 1, Media('photo', url), "подпись")
+        assert bot.uploads == [(1, cache.path_for(url), "подпись")]
+        assert bot.messages == []
+
+    _run(scenario)
+
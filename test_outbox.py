@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.database import Base, SessionLocal
+from app.handlers.utils_outbox import Outbox
+from config import config
+from services.Post import Post
+
+# Пост из двух текстовых шагов (длиннее лимита сообщения)
+LONG_POST = Post(id='long', text='a' * 4000 + ' ' + 'b' * 300, created_at=0)
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch):
+    """Очередь на SQLite в памяти вместо Postgres (SKIP LOCKED там игнорируется, аренда работает так же)"""
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    SessionLocal.configure(bind=engine)
+    monkeypatch.setattr(config, 'ADMINS', [])
+    yield
+    SessionLocal.configure(bind=None)
+    engine.dispose()
+
+
+def _outbox(**kwargs):
+    params = dict(workers=1, batch_size=50, max_attempts=3, retry_base=0, poll_interval=0.1, lease_seconds=600)
+    params.update(kwargs)
+    return Outbox(**params)
+
+
+def _enqueue(outbox, post, chat_ids):
+    with SessionLocal() as db:
+        outbox.enqueue(db, 'channel', post, chat_ids)
+        db.commit()
+
+
+def _rows():
+    with SessionLocal() as db:
+        return {
+            int(row.chat_id): (row.status, row.steps_sent, row.attempts)
+            for row in db.query(models.OutboxMessage)
+        }
+
+
+class _Bot:
+    """Записывает отправленные сообщения; может уронить или придержать отправку в чат"""
+
+    def __init__(self, fail_once=(), hold=None):
+        self.sent = []
+        self.fail_once = dict(fail_once)  # chat_id -> номер сообщения, на котором упасть один раз
+        self.hold = hold or {}  # chat_id -> asyncio.Event, до которого ждет второе сообщение
+
+    async def send_message(self, chat_id, text, **kwargs):
+        number = sum(1 for chat, _ in self.sent if chat == chat_id)
+        if self.fail_once.get(chat_id) == number:
+            del self.fail_once[chat_id]
+            raise RuntimeError("Telegram error")
+        if chat_id in self.hold and number == 1:
+            await self.hold[chat_id].wait()
+        self.sent.append((chat_id, text[0]))
+
+
+def test_retry_resumes_from_first_unsent_step():
+    outbox = _outbox()
+    _enqueue(outbox, LONG_POST, ['1', '2'])
+    bot = _Bot(fail_once={2: 1})
+
+    async def main():
+        assert await outbox.process_batch(bot) == 2
+        assert _rows() == {1: ('sent', 2, 0), 2: ('pending', 1, 1)}
+        assert await outbox.process_batch(bot) == 1
+
+    asyncio.run(main())
+    assert _rows() == {1: ('sent', 2, 0), 2: ('sent', 2, 1)}
+    # Второму чату первый шаг не отправлялся повторно
+    assert bot.sent.count((2, 'a')) == 1 and bot.sent.count((2, 'b')) == 1
+
+
+def test_progress_is_committed_while_other_chats_are_still_sending():
+    outbox = _outbox()
+    _enqueue(outbox, LONG_POST, ['1', '2'])
+    bot = _Bot()
+
+    async def main():
+        bot.hold = {2: asyncio.Event()}
+        batch = asyncio.create_task(outbox.process_batch(bot))
+        await asyncio.sleep(0.1)
+        # Первый чат завершен и закоммичен, второй - отправлен один шаг из двух
+        assert _rows() == {1: ('sent', 2, 0), 2: ('in_progress', 1, 0)}
+        batch.cancel()
+        await asyncio.gather(batch, return_exceptions=True)
+
+    asyncio.run(main())
+    # Остановка вернула в очередь только незавершенный чат
+    assert _rows() == {1: ('sent', 2, 0), 2: ('pending', 1, 0)}
+
+
+def test_expired_lease_is_reclaimed_only_for_unfinished_chats():
+    _enqueue(_outbox(), LONG_POST, ['1', '2'])
+    with SessionLocal() as db:
+        # Воркер упал: первый чат доставлен, второй - на середине, аренда истекла
+        for row in db.query(models.OutboxMessage):
+            if row.chat_id == '1':
+                row.status, row.steps_sent = 'sent', 2
+            else:
+                row.status, row.steps_sent = 'in_progress', 1
+                row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+    bot = _Bot()
+
+    assert asyncio.run(_outbox().process_batch(bot)) == 1
+    assert bot.sent == [(2, 'b')]
+
+
+def test_lease_is_renewed_during_long_delivery():
+    outbox = _outbox(lease_seconds=0.3)
+    _enqueue(outbox, LONG_POST, ['1'])
+    bot = _Bot()
+
+    async def main():
+        bot.hold = {1: asyncio.Event()}
+        batch = asyncio.create_task(outbox.process_batch(bot))
+        await asyncio.sleep(0.8)
+        # Аренда продлевается - второй воркер строку не забирает
+        assert await _outbox(lease_seconds=0.3).process_batch(_Bot()) == 0
+        bot.hold[1].set()
+        assert await batch == 1
+
+    asyncio.run(main())
+    assert _rows() == {1: ('sent', 2, 0)}
+    assert bot.sent == [(1, 'a'), (1, 'b')]
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from fake_twitter_api import FakeTwitterApi, parse_args
+from services.http_session import close_session
+from services.RateLimiter import QuotaExhaustedError, RateLimitPacer
+from services.Twitter import AsyncTwitter
+
+
+def _headers(remaining, reset, limit=1000, **extra):
+    headers = {
+        RateLimitPacer.LIMIT_HEADER: str(limit),
+        RateLimitPacer.REMAINING_HEADER: str(remaining),
+        RateLimitPacer.RESET_HEADER: str(reset),
+    }
+    headers.update(extra)
+    return headers
+
+
+def _pacer(**kwargs):
+    params = dict(max_rate=5, burst=5, quota_reserve=0, low_water=50, backoff=2, max_wait=300)
+    params.update(kwargs)
+    return RateLimitPacer(**params)
+
+
+def test_full_rate_while_quota_above_low_water():
+    pacer = _pacer()
+    # Месячное окно: остаток не растягивается на 20 дней
+    pacer.update_from_headers(_headers(remaining=900, reset=20 * 86400))
+    assert pacer.rate == 5
+    assert pacer.reserve() == 0
+
+
+def test_slows_down_below_low_water():
+    pacer = _pacer()
+    pacer.update_from_headers(_headers(remaining=25, reset=20 * 86400))
+    assert pacer.rate == pytest.approx(2.5)
+
+
+def test_short_exhaustion_waits_for_reset():
+    pacer = _pacer()
+    pacer.update_from_headers(_headers(remaining=0, reset=10))
+    assert 10 <= pacer.reserve() < 11
+
+
+def test_long_exhaustion_fails_fast():
+    pacer = _pacer()
+    pacer.update_from_headers(_headers(remaining=0, reset=86400))
+    with pytest.raises(QuotaExhaustedError):
+        pacer.reserve()
+
+
+def test_rate_limited_without_retry_after_backs_off_briefly():
+    pacer = _pacer()
+    # Посекундный лимит: квота есть - короткая пауза, а не до сброса окна
+    assert pacer.on_rate_limited(_headers(remaining=20, reset=20 * 86400)) == 2
+    assert pacer.on_rate_limited({}) == 2
+
+
+def test_rate_limited_with_exhausted_quota_waits_for_reset():
+    pacer = _pacer()
+    assert pacer.on_rate_limited(_headers(remaining=0, reset=100)) == 100
+    assert pacer.on_rate_limited(_headers(remaining=20, reset=100, **{'retry-after': '7'})) == 7
+
+
+def test_quota_exhausted_request_fails_fast_against_fake_api():
+    """Квота 3 запроса в сутки: четвертый запрос завершается ошибкой сразу, а не через 24 часа"""
+    async def main():
+        api = FakeTwitterApi(parse_args(['--quota', '3', '--window', '86400']))
+        runner = web.AppRunner(api.build_app())
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            client = AsyncTwitter(f"127.0.0.1:{port}", ['test-daily-quota'], scheme='http')
+            for _ in range(3):
+                assert (await client.get_user_by_username('someone'))['error'] == 'false'
+
+            started = time.monotonic()
+            result = await asyncio.wait_for(client.get_user_by_username('someone'), 5)
+            assert result['error'] == 'true'
+            assert 'Quota Exhausted' in result['data']
+            assert time.monotonic() - started < 1
+            assert api.stats['requests'] == 3
+        finally:
+            await close_session()
+            await runner.cleanup()
+
+    asyncio.run(main())
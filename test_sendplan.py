@@ -0,0 +1,59 @@
+from app.handlers.utils_sendplan import (
+    CAPTION_LIMIT, MESSAGE_LIMIT, SendStep, build_send_plan, compose_media_steps, split_text
+)
+from services.Post import Media, Post
+
+
+def _media(kind, count):
+    return tuple(Media(type=kind, url=f"https://example.com/{kind}/{i}") for i in range(count))
+
+
+def _post(text, media=()):
+    return Post(id='1', text=text, created_at=0, media=tuple(media))
+
+
+def _kinds(plan):
+    return [step.kind for step in plan.steps]
+
+
+def test_text_only_post():
+    plan = build_send_plan(_post("привет"))
+    assert plan.steps == (SendStep('text', text="привет"),)
+
+
+def test_short_text_becomes_caption_of_first_media_step():
+    plan = build_send_plan(_post("подпись", _media('photo', 2) + _media('animated_gif', 1)))
+    assert _kinds(plan) == ['album', 'animation']
+    assert plan.steps[0].text == "подпись"
+    assert plan.steps[1].text is None
+
+
+def test_long_text_goes_as_messages_after_media():
+    text = 'x' * (CAPTION_LIMIT + 1)
+    plan = build_send_plan(_post(text, _media('photo', 1)))
+    assert plan.steps == (
+        SendStep('photo', media=_media('photo', 1)),
+        SendStep('text', text=text),
+    )
+
+
+def test_text_over_message_limit_is_split():
+    text = 'a' * 4000 + '\n' + 'b' * 300
+    plan = build_send_plan(_post(text, _media('video', 1)))
+    assert _kinds(plan) == ['video', 'text', 'text']
+    assert [step.text for step in plan.steps[1:]] == ['a' * 4000, 'b' * 300]
+    assert all(len(chunk) <= MESSAGE_LIMIT for chunk in split_text('c' * 10000))
+
+
+def test_media_is_grouped_into_albums_of_ten():
+    media = _media('photo', 7) + _media('video', 4)
+    steps = compose_media_steps(media, "подпись")
+    assert [(step.kind, len(step.media)) for step in steps] == [('album', 10), ('video', 1)]
+    assert [step.text for step in steps] == ["подпись", None]
+
+
+def test_gifs_are_sent_separately():
+    media = _media('animated_gif', 2) + _media('photo', 1)
+    steps = compose_media_steps(media, None)
+    assert [step.kind for step in steps] == ['photo', 'animation', 'animation']
+    assert all(len(step.media) == 1 for step in steps)
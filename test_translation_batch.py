@@ -0,0 +1,144 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from config import config
+from services.ChatGPT import ChatGPT, parse_batch_response
+from services.LatencyTracker import LatencyTracker
+
+
+class _FakeCompletions:
+    """chat.completions OpenAI: пакет (JSON-массив) и одиночные тексты обрабатываются handler-ами"""
+
+    def __init__(self, batch_handler, single_handler):
+        self.batch_handler = batch_handler
+        self.single_handler = single_handler
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def create(self, model, messages):
+        content = messages[-1]['content']
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if content.startswith('['):
+                self.calls.append('batch')
+                answer = await self.batch_handler(json.loads(content))
+            else:
+                self.calls.append(content)
+                answer = await self.single_handler(content)
+        finally:
+            self.active -= 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))])
+
+
+def _chatgpt(completions: _FakeCompletions) -> ChatGPT:
+    chatgpt = ChatGPT()
+    chatgpt.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return chatgpt
+
+
+async def _translate_single(text):
+    return f"перевод {text}"
+
+
+def test_parse_batch_response():
+    content = '```json\n{"translations": [{"id": "1", "text": " один "}, {"id": "2", "text": ""}, {"id": "9", "text": "x"}]}\n```'
+    assert parse_batch_response(content, ['1', '2']) == {'1': 'один'}
+    assert parse_batch_response('не JSON', ['1']) == {}
+    assert parse_batch_response('{"translations": "oops"}', ['1']) == {}
+
+
+def test_missing_batch_items_are_translated_one_by_one():
+    async def batch(items):
+        # Модель "забыла" последний пост
+        return json.dumps({'translations': [{'id': item['id'], 'text': f"перевод {item['text']}"} for item in items[:-1]]})
+
+    completions = _FakeCompletions(batch, _translate_single)
+    texts = {'1': 'one', '2': 'two', '3': 'three'}
+    result = asyncio.run(_chatgpt(completions).translate_batch(texts))
+    assert result == {'1': 'перевод one', '2': 'перевод two', '3': 'перевод three'}
+    assert completions.calls == ['batch', 'three']
+
+
+def test_batch_timeout_falls_back_concurrently_and_keeps_results():
+    async def slow_batch(items):
+        await asyncio.sleep(5)
+
+    async def single(text):
+        if text == 'stuck':
+            await asyncio.sleep(5)
+        await asyncio.sleep(0.05)
+        return f"перевод {text}"
+
+    completions = _FakeCompletions(slow_batch, single)
+    texts = {'1': 'one', '2': 'two', '3': 'stuck'}
+
+    async def main():
+        return await _chatgpt(completions).translate_batch(
+            texts, timeout=0.3, semaphore=asyncio.Semaphore(3)
+        )
+
+    result = asyncio.run(main())
+    # Переводы, полученные до таймаута соседнего запроса, не теряются
+    assert result == {'1': 'перевод one', '2': 'перевод two', '3': None}
+    # Одиночные запросы идут параллельно, в пределах семафора
+    assert completions.max_active == 3
+
+
+def test_semaphore_limits_concurrent_requests():
+    async def no_batch(items):
+        return ''
+
+    async def single(text):
+        await asyncio.sleep(0.02)
+        return f"перевод {text}"
+
+    completions = _FakeCompletions(no_batch, single)
+    texts = {str(i): f"text {i}" for i in range(6)}
+
+    async def main():
+        return await _chatgpt(completions).translate_batch(texts, semaphore=asyncio.Semaphore(2))
+
+    result = asyncio.run(main())
+    assert all(result[item_id] == f"перевод {text}" for item_id, text in texts.items())
+    assert completions.max_active == 2
+
+
+def test_no_hedging_without_samples_for_that_kind_of_call(monkeypatch):
+    tracker = LatencyTracker()
+    monkeypatch.setattr(ChatGPT, 'latency', tracker)
+    monkeypatch.setattr(config, 'GPT_HEDGE_MIN_SAMPLES', 5)
+
+    async def slow_single(text):
+        await asyncio.sleep(0.2)
+        return "перевод"
+
+    completions = _FakeCompletions(None, slow_single)
+    chatgpt = _chatgpt(completions)
+    model = chatgpt.choose_model('text')
+    # Быстрые пакеты не дают замеров одиночным запросам
+    for _ in range(10):
+        tracker.record(ChatGPT.latency_key(model, 'batch'), 0.01)
+
+    assert asyncio.run(chatgpt.request_translation('text')) == "перевод"
+    assert completions.calls == ['text']
+
+
+def test_hedges_after_enough_samples(monkeypatch):
+    tracker = LatencyTracker()
+    monkeypatch.setattr(ChatGPT, 'latency', tracker)
+    monkeypatch.setattr(config, 'GPT_HEDGE_MIN_SAMPLES', 5)
+
+    async def slow_single(text):
+        await asyncio.sleep(0.2)
+        return "перевод"
+
+    completions = _FakeCompletions(None, slow_single)
+    chatgpt = _chatgpt(completions)
+    for _ in range(10):
+        tracker.record(ChatGPT.latency_key(chatgpt.choose_model('text'), 'single'), 0.01)
+
+    assert asyncio.run(chatgpt.request_translation('text')) == "перевод"
+    assert completions.calls == ['text', 'text']
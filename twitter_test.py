@@ -2,10 +2,13 @@ import json
 from datetime import datetime, timedelta
 
 from services.Twitter import Twitter
+from config import config
 
 
-API_HOST = 'twitter241.p.rapidapi.com'
-API_KEY = '34df59c0aemshf4c684e2f49ddc1p12f8b0jsn019a0b39d7f8'
+# Для офлайн-проверки: python fake_twitter_api.py
+# и TWITTER_API_HOST=localhost:8080 TWITTER_API_SCHEME=http
+API_HOST = config.TWITTER_API_HOST
+API_KEY = config.TWITTER_API_KEY
 
 
 # user = '1570754138648023043'